@@ -0,0 +1,108 @@
+"""Archive old Actions in compressed files, out of the database."""
+
+import gzip
+import json
+from collections.abc import Iterator
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import localtime
+
+from .models import Action, resolve_items
+
+
+def get_path(month: str) -> Path:
+    """Get the archive file of a "YYYY-MM" month."""
+    return Path(settings.ACTIONS_ARCHIVE_DIR) / f"actions-{month}.jsonl.gz"
+
+
+def to_line(action: Action) -> str:
+    """Serialize an action."""
+    return json.dumps(
+        {
+            "pk": action.pk,
+            "created": action.created.isoformat(),
+            "updated": action.updated.isoformat(),
+            "user": action.user_id,
+            "act": action.act,
+            "json": action.json,
+            "object_id": action.object_id,
+            "parent_id": action.parent_id,
+        },
+    )
+
+
+def from_line(line: str) -> Action:
+    """Get back an unsaved action."""
+    data = json.loads(line)
+    return Action(
+        pk=data["pk"],
+        created=parse_datetime(data["created"]),
+        updated=parse_datetime(data["updated"]),
+        user_id=data["user"],
+        act=data["act"],
+        json=data["json"],
+        content_type=ContentType.objects.get_by_natural_key(
+            *data["json"]["model"].split("."),
+        ),
+        object_id=data["object_id"],
+        parent_id=data["parent_id"],
+    )
+
+
+@transaction.atomic
+def archive(before: datetime) -> int:
+    """Move the actions created before a date to the archive, and count them."""
+    actions = Action.objects.filter(created__lt=before)
+    Path(settings.ACTIONS_ARCHIVE_DIR).mkdir(parents=True, exist_ok=True)
+    count, last = 0, None
+    with ExitStack() as stack:
+        files = {}
+        for action in actions.order_by("pk").iterator(chunk_size=1000):
+            month = f"{localtime(action.created):%Y-%m}"
+            if month not in files:
+                files[month] = stack.enter_context(
+                    gzip.open(get_path(month), "at", encoding="utf-8"),
+                )
+            files[month].write(to_line(action) + "\n")
+            count, last = count + 1, action.pk
+    if last is not None:
+        actions.filter(pk__lte=last).delete()
+    return count
+
+
+def iter_archive(since: datetime | None = None) -> Iterator[Action]:
+    """Read archived actions, from the month of since if given."""
+    first = get_path(f"{localtime(since):%Y-%m}").name if since else ""
+    for path in sorted(Path(settings.ACTIONS_ARCHIVE_DIR).glob("actions-*.jsonl.gz")):
+        if path.name >= first:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                yield from map(from_line, f)
+
+
+def history(instance, *children) -> list[Action]:
+    """Get archived actions on instance, and on its children of some models.
+
+    Like ActionQuerySet.history(), but this reads the files of all months since
+    the instance was created, so it is only meant to be used on demand.
+    """
+    label = instance._meta.label_lower
+    children = {child._meta.label_lower for child in children}
+    actions = {}  # by pk, in case an archival was interrupted and run again
+    for action in iter_archive(getattr(instance, "created", None)):
+        model = action.json["model"]
+        if (model == label and action.object_id == instance.pk) or (
+            model in children and action.parent_id == instance.pk
+        ):
+            actions[action.pk] = action
+    users = get_user_model().objects.in_bulk({a.user_id for a in actions.values()})
+    for action in actions.values():
+        if action.user_id in users:
+            action.user = users[action.user_id]
+    return resolve_items(list(actions.values()))
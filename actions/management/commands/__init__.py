@@ -0,0 +1 @@
+"""Management Commands for Actions."""
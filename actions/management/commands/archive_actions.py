@@ -0,0 +1,31 @@
+"""Archive actions management command."""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from actions.archive import archive
+
+
+class Command(BaseCommand):
+    """Archive actions management command."""
+
+    help = "move old actions out of the database, into compressed monthly files"
+
+    def add_arguments(self, parser):
+        """Configure the retention horizon."""
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ACTIONS_RETENTION_DAYS,
+            help="keep actions created in the last DAYS days in the database",
+        )
+
+    def handle(self, *args, days, **options):
+        """Archive actions management command."""
+        count = archive(timezone.now() - timedelta(days=days))
+        self.stdout.write(
+            f"{count} action(s) archived in {settings.ACTIONS_ARCHIVE_DIR}"
+        )
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+PARENTS = {"compotes.part": "debt", "compotes.share": "pool"}
+
+
+def backfill(apps, schema_editor):
+    """Fill the target columns from the serialized objects."""
+    Action = apps.get_model("actions", "Action")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    content_types = {}
+    batch = []
+    for action in Action.objects.order_by("pk").iterator(chunk_size=1000):
+        label = action.json["model"]
+        if label not in content_types:
+            app_label, model = label.split(".")
+            content_types[label] = ContentType.objects.get_or_create(
+                app_label=app_label,
+                model=model,
+            )[0]
+        action.content_type = content_types[label]
+        action.object_id = action.json["pk"]
+        if label in PARENTS:
+            action.parent_id = action.json["fields"][PARENTS[label]]
+        batch.append(action)
+        if len(batch) == 1000:
+            Action.objects.bulk_update(
+                batch,
+                ["content_type", "object_id", "parent_id"],
+            )
+            batch = []
+    Action.objects.bulk_update(batch, ["content_type", "object_id", "parent_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("actions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="action",
+            name="content_type",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="contenttypes.contenttype",
+            ),
+        ),
+        migrations.AddField(
+            model_name="action",
+            name="object_id",
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="action",
+            name="parent_id",
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="action",
+            index=models.Index(
+                fields=["content_type", "object_id"],
+                name="actions_act_content_f49b3a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="action",
+            index=models.Index(
+                fields=["content_type", "parent_id"],
+                name="actions_act_content_4fa5f4_idx",
+            ),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
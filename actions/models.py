@@ -1,15 +1,41 @@
 """Model to log users actions."""
 
+from collections import defaultdict
 from json import loads
 
 from django.apps import apps
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.serializers import serialize
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from ndh.models import TimeStampedModel
 
 
+class ActionQuerySet(models.QuerySet):
+    """QuerySet for Actions."""
+
+    def with_items(self) -> list["Action"]:
+        """Get these actions with their users, and resolve their items in bulk.
+
+        This makes one query per model, instead of one per action in Action.item().
+        """
+        return resolve_items(list(self.select_related("user")))
+
+    def history(self, instance, *children) -> "ActionQuerySet":
+        """Filter actions on instance, and on its children of some models."""
+        condition = models.Q(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+        )
+        for child in children:
+            condition |= models.Q(
+                content_type=ContentType.objects.get_for_model(child),
+                parent_id=instance.pk,
+            )
+        return self.filter(condition)
+
+
 class Action(TimeStampedModel):
     """Log users actions on other models."""
 
@@ -23,6 +49,23 @@ class Action(TimeStampedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     act = models.CharField(max_length=1, choices=Act.choices)
     json = models.JSONField()
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.PROTECT,
+        null=True,
+    )
+    object_id = models.PositiveBigIntegerField(null=True)
+    parent_id = models.PositiveBigIntegerField(null=True)
+
+    objects = ActionQuerySet.as_manager()
+
+    class Meta:
+        """Meta."""
+
+        indexes = [
+            models.Index(fields=["content_type", "object_id"]),
+            models.Index(fields=["content_type", "parent_id"]),
+        ]
 
     def __str__(self):
         """Describe this action."""
@@ -48,15 +91,59 @@ class Action(TimeStampedModel):
 
     def model(self):
         """Return the Model."""
-        app_label, model_name = self.json["model"].split(".")
-        return apps.get_model(app_label=app_label, model_name=model_name)
+        return get_model(self.json["model"])
 
     def item(self):
         """Get item, if it still exist, or an older serialized version."""
-        obj = self.model().objects.filter(pk=self.json["pk"])
-        if obj.exists():
-            return obj.first()
-        return self.json
+        if not hasattr(self, "resolved_item"):
+            obj = self.model().objects.filter(pk=self.json["pk"]).first()
+            self.resolved_item = self.json if obj is None else obj
+        return self.resolved_item
+
+    @classmethod
+    def log(cls, user, act: str, inst, pk: int | None = None) -> "Action":
+        """Build the Action of an user on a django object.
+
+        pk is needed for objects which were just deleted, and lost theirs.
+        """
+        return cls(
+            user=user,
+            act=act,
+            json=to_json(inst),
+            content_type=ContentType.objects.get_for_model(inst),
+            object_id=inst.pk or pk,
+            parent_id=get_parent_id(inst),
+        )
+
+
+def resolve_items(actions: list[Action]) -> list[Action]:
+    """Resolve the items of some actions in bulk, with one query per model."""
+    pks = defaultdict(set)
+    for action in actions:
+        if action.json["pk"] is not None:
+            pks[action.json["model"]].add(action.json["pk"])
+    items = {
+        label: get_model(label).objects.select_related().in_bulk(model_pks)
+        for label, model_pks in pks.items()
+    }
+    for action in actions:
+        action.resolved_item = items.get(action.json["model"], {}).get(
+            action.json["pk"],
+            action.json,
+        )
+    return actions
+
+
+def get_parent_id(inst) -> int | None:
+    """Get the pk of the parent of a django object, named by its action_parent."""
+    parent = getattr(inst, "action_parent", None)
+    return None if parent is None else getattr(inst, f"{parent}_id")
+
+
+def get_model(label: str):
+    """Get a Model from its "app_label.model_name" label."""
+    app_label, model_name = label.split(".")
+    return apps.get_model(app_label=app_label, model_name=model_name)
 
 
 def to_json(inst):
@@ -2,7 +2,7 @@
 
 from django.http import HttpResponse
 
-from actions.models import Action, to_json
+from actions.models import Action
 
 
 class ActionMixin:
@@ -10,12 +10,10 @@ class ActionMixin:
 
     def form_valid(self, form) -> HttpResponse:
         """Log this action."""
+        obj = getattr(self, "object", None)
+        pk = None if obj is None else obj.pk
         ret = super().form_valid(form)
-        Action.objects.create(
-            user=self.request.user,
-            act=self.act,
-            json=to_json(self.object),
-        )
+        Action.log(self.request.user, self.act, self.object, pk).save()
         return ret
 
 
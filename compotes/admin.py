@@ -1,11 +1,14 @@
 """Compotes admin ui."""
 
+from io import StringIO
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.management import call_command
 from django.http import HttpResponseRedirect
 from django.urls import path, reverse
 
-from . import models
+from . import ledger, models
 
 
 @admin.register(models.User)
@@ -22,12 +25,46 @@ class UserAdmin(BaseUserAdmin):
             *super().get_urls(),
         ]
 
-    def update_balance(self, request):  # pragma: no cover
+    def update_balance(self, request):
         """View to update balances."""
-        for user in models.User.objects.all():
-            user.save()
+        out = StringIO()
+        call_command("recompute_balances", stdout=out)
+        self.message_user(request, out.getvalue().splitlines()[-1])
         return HttpResponseRedirect(reverse("admin:compotes_user_changelist"))
 
 
+class LedgerAdmin(admin.ModelAdmin):
+    """Recompute the ledger once per admin action."""
+
+    def changeform_view(self, *args, **kwargs):
+        """Add or change in a ledger.deferred() block."""
+        with ledger.deferred():
+            return super().changeform_view(*args, **kwargs)
+
+    def changelist_view(self, *args, **kwargs):
+        """Run bulk actions in a ledger.deferred() block."""
+        with ledger.deferred():
+            return super().changelist_view(*args, **kwargs)
+
+    def delete_view(self, *args, **kwargs):
+        """Delete in a ledger.deferred() block."""
+        with ledger.deferred():
+            return super().delete_view(*args, **kwargs)
+
+    def delete_queryset(self, request, queryset):
+        """Delete objects one by one, to mark what they change in the ledger."""
+        for obj in queryset:
+            obj.delete()
+
+
 for model in (models.Debt, models.Part, models.Pool, models.Share):
-    admin.site.register(model)
+    admin.site.register(model, LedgerAdmin)
+
+
+@admin.register(models.Mail)
+class MailAdmin(admin.ModelAdmin):
+    """Show the mail spool."""
+
+    list_display = ("subject", "to", "created", "attempts", "next_try", "sent")
+    list_filter = ("sent", "next_try")
+    search_fields = ("to", "subject")
@@ -0,0 +1,151 @@
+"""Benchmark the ledger on synthetic data."""
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from decimal import Decimal
+from random import Random
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from actions.models import Action
+
+from . import views
+from .models import Debt, Part, Pool, Share, User, recompute
+
+# Rendered views must not come from the ledger cache
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+@dataclass
+class Ledger:
+    """Objects of a synthetic ledger."""
+
+    users: list[User]
+    debts: list[Debt]
+    pools: list[Pool]
+
+
+def generate(size: int, seed: int = 0, parts: int = 20, shares: int = 20) -> Ledger:
+    """Make a synthetic ledger with size debts, and size / 10 pools.
+
+    Debts have up to parts parts, and pools up to shares shares, from random users.
+    """
+    rng = Random(seed)
+    users = User.objects.bulk_create(
+        User(username=f"benchmark-{i}", slug=f"benchmark-{i}", first_name=f"B{i}")
+        for i in range(max(parts, shares, size // 10))
+    )
+    debts = Debt.objects.bulk_create(
+        Debt(
+            name=f"debt {i}",
+            creditor=rng.choice(users),
+            value=Decimal(rng.randint(100, 100000)) / 100,
+        )
+        for i in range(size)
+    )
+    part_objs = Part.objects.bulk_create(
+        Part(debt=debt, debitor=debitor, part=rng.choice((0.5, 1, 2)))
+        for debt in debts
+        for debitor in rng.sample(users, rng.randint(1, parts))
+    )
+    pools = Pool.objects.bulk_create(
+        Pool(
+            name=f"benchmark-{i}",
+            slug=f"benchmark-{i}",
+            organiser=rng.choice(users),
+            value=rng.randint(10, 1000),
+        )
+        for i in range(max(1, size // 10))
+    )
+    share_objs = Share.objects.bulk_create(
+        Share(pool=pool, participant=participant, maxi=rng.randint(1, 100))
+        for pool in pools
+        for participant in rng.sample(users, rng.randint(1, shares))
+    )
+    Action.objects.bulk_create(
+        (
+            Action.log(rng.choice(users), "C", obj)
+            for obj in (*debts, *part_objs, *pools, *share_objs)
+        ),
+        batch_size=1000,
+    )
+    recompute(debts=[debt.pk for debt in debts], pools=[pool.pk for pool in pools])
+    return Ledger(users, debts, pools)
+
+
+def get_scenarios(ledger: Ledger) -> dict[str, Callable]:
+    """Get the operations to time on a ledger."""
+    debt = max(ledger.debts, key=lambda debt: debt.part_set.count())
+    part = debt.part_set.first()
+    pool = max(ledger.pools, key=lambda pool: pool.share_set.count())
+    user = debt.creditor
+    factory = RequestFactory(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+    def view(view_class, url: str, **kwargs) -> Callable:
+        def render():
+            request = factory.get(url)
+            request.user = user
+            with override_settings(CACHES=NO_CACHE):
+                view_class.as_view()(request, **kwargs).render()
+
+        return render
+
+    return {
+        "Debt.save": debt.save,
+        "Part.save": part.save,
+        "Pool.save": pool.save,
+        "User.save": user.save,
+        "UserListView": view(views.UserListView, reverse("home")),
+        "UserDetailView": view(
+            views.UserDetailView,
+            user.get_absolute_url(),
+            slug=user.slug,
+        ),
+        "DebtListView": view(views.DebtListView, reverse("debt_list")),
+        "DebtDetailView": view(
+            views.DebtDetailView,
+            debt.get_absolute_url(),
+            pk=debt.pk,
+        ),
+        "PoolListView": view(views.PoolListView, reverse("pool_list")),
+        "PoolDetailView": view(
+            views.PoolDetailView,
+            pool.get_absolute_url(),
+            slug=pool.slug,
+        ),
+    }
+
+
+def measure(scenario: Callable, repeat: int = 3) -> tuple[float, int]:
+    """Get the best wall time of a scenario, and its number of SQL queries."""
+    seconds = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = perf_counter()
+            scenario()
+            seconds.append(perf_counter() - start)
+    return min(seconds), len(queries)
+
+
+def run(sizes: Iterable[int], seed: int = 0, repeat: int = 3, **kwargs) -> list[dict]:
+    """Time all scenarios on ledgers of some sizes."""
+    results = []
+    for size in sizes:
+        with transaction.atomic():
+            for name, scenario in get_scenarios(generate(size, seed, **kwargs)).items():
+                seconds, queries = measure(scenario, repeat)
+                results.append(
+                    {
+                        "size": size,
+                        "scenario": name,
+                        "seconds": seconds,
+                        "queries": queries,
+                    },
+                )
+            transaction.set_rollback(True)
+    return results
@@ -0,0 +1,100 @@
+"""Stream the rows of the ledger, as CSV or JSON Lines."""
+
+import csv
+import json
+from collections.abc import Iterator, Mapping
+from datetime import datetime
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
+
+from actions.models import Action
+
+from .filters import DebtFilter
+from .forms import ExportForm
+from .models import Debt, Part, Pool, Share
+
+CHUNK_SIZE = 1000
+FORMATS = {"csv": "text/csv", "jsonl": "application/jsonl"}
+
+
+class Export(NamedTuple):
+    """A model to export, with the paths of its date and its Debt."""
+
+    model: type[Model]
+    date: str
+    debt: str | None = None
+
+    @property
+    def fields(self) -> list[str]:
+        """Get the columns of this export."""
+        return [field.attname for field in self.model._meta.concrete_fields]
+
+
+EXPORTS = {
+    "debts": Export(Debt, "date", "pk"),
+    "parts": Export(Part, "debt__date", "debt"),
+    "pools": Export(Pool, "created"),
+    "shares": Export(Share, "pool__created"),
+    "actions": Export(Action, "created"),
+}
+
+
+def get_queryset(export: Export, data: Mapping) -> QuerySet:
+    """Filter the rows of an export by date, and by the DebtFilter parameters.
+
+    Raise a ValidationError for invalid dates.
+    """
+    form = ExportForm(data)
+    if not form.is_valid():
+        raise ValidationError(form.errors.as_text())
+    queryset = export.model.objects.all()
+    if since := form.cleaned_data["since"]:
+        queryset = queryset.filter(**{f"{export.date}__gte": since})
+    if until := form.cleaned_data["until"]:
+        queryset = queryset.filter(**{f"{export.date}__lt": until})
+    if export.debt and any(data.get(name) for name in DebtFilter.base_filters):
+        debts = DebtFilter(data, queryset=Debt.objects.all()).qs
+        queryset = queryset.filter(**{f"{export.debt}__in": debts.values("pk")})
+    return queryset.order_by("pk")
+
+
+class Echo:
+    """A file-like object which gives back what is written to it."""
+
+    def write(self, value: str) -> str:
+        """Give back value."""
+        return value
+
+
+def to_cell(value):
+    """Write dates in ISO format and JSON in JSON, for CSV."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict | list):
+        return json.dumps(value)
+    return value
+
+
+def stream(
+    export: Export,
+    queryset: QuerySet,
+    fmt: str = "csv",
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    """Get the lines of an export, in the fmt of FORMATS."""
+    fields = export.fields
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(map(to_cell, row))
+    else:
+        for row in rows:
+            yield (
+                json.dumps(dict(zip(fields, row, strict=True)), cls=DjangoJSONEncoder)
+                + "\n"
+            )
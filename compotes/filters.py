@@ -1,22 +1,22 @@
 """Filters for compotes querysets."""
 
+from functools import reduce
+from operator import add
+
 import django_filters
-from django.db.models import Q
+from django.db.models import F
+from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
-from ndh.forms import DatalistField
-
-from .models import Debt, User
-
 
-def get_users():
-    """Get the dict of all users by username and representation."""
-    return {u.username: repr(u) for u in User.objects.all()}
+from . import search
+from .forms import AutocompleteField
+from .models import Debt
 
 
 class DatalistFilter(django_filters.Filter):
-    """A Filter with DatalistField."""
+    """A Filter with a datalist, whose options are fetched from url while typing."""
 
-    field_class = DatalistField
+    field_class = AutocompleteField
 
 
 class DebtFilter(django_filters.FilterSet):
@@ -26,7 +26,7 @@ class DebtFilter(django_filters.FilterSet):
         label=_("User"),
         help_text=_("Filter by Creditor and/or Debitor"),
         method="user_filter",
-        datalist=get_users,
+        url=reverse_lazy("user_search"),
     )
     debt = django_filters.CharFilter(
         label=_("Debt"),
@@ -41,18 +41,23 @@ class DebtFilter(django_filters.FilterSet):
         fields = ["user", "debt"]
 
     def user_filter(self, queryset, name, value):
-        """Filter debts by creditor / debitor username."""
-        return queryset.filter(
-            Q(creditor__username__icontains=value)
-            | Q(creditor__last_name__icontains=value)
-            | Q(creditor__first_name__icontains=value)
-            | Q(part__debitor__username__icontains=value)
-            | Q(part__debitor__last_name__icontains=value)
-            | Q(part__debitor__first_name__icontains=value),
-        ).distinct()
-
-    def debt_filter(self, queryset, nam, value):
-        """Filter debts by name / description."""
-        return queryset.filter(
-            Q(name__icontains=value) | Q(description__icontains=value),
-        )
+        """Search debts by the names of their creditor and debitors."""
+        return search.get_backend().filter(queryset, "users", value)
+
+    def debt_filter(self, queryset, name, value):
+        """Search debts by name / description."""
+        return search.get_backend().filter(queryset, "text", value)
+
+    def filter_queryset(self, queryset):
+        """Filter, and rank debts by relevance when searching."""
+        queryset = super().filter_queryset(queryset)
+        ranks = [
+            F(name)
+            for name in ("users_rank", "text_rank")
+            if name in queryset.query.annotations
+        ]
+        if ranks:
+            queryset = queryset.annotate(rank=reduce(add, ranks)).order_by(
+                "-rank", "-date"
+            )
+        return queryset
@@ -1,10 +1,21 @@
 """Compotes forms."""
 
-from django.forms import ModelForm
+from django import forms
+from django.forms import BaseInlineFormSet, ModelForm, inlineformset_factory
 from django.utils import timezone
-from ndh.forms import AccessibleDateTimeField
+from django.utils.translation import gettext_lazy as _
+from ndh.forms import AccessibleDateTimeField, DatalistField
 
-from .models import Debt, Part, Share
+from .models import Debt, Part, Share, User
+
+
+class AutocompleteField(DatalistField):
+    """A DatalistField, whose options are fetched from url while typing."""
+
+    def __init__(self, url, **kwargs):
+        """Initialize with an empty datalist, and the url of its options."""
+        super().__init__(datalist={}, **kwargs)
+        self.widget.attrs.update({"data-autocomplete": url, "autocomplete": "off"})
 
 
 class DebtForm(ModelForm):
@@ -29,6 +40,141 @@ class PartForm(ModelForm):
         fields = ["debitor", "part", "description"]
 
 
+class ExportForm(forms.Form):
+    """Date range of an export."""
+
+    since = forms.DateTimeField(label=_("Since"), required=False)
+    until = forms.DateTimeField(label=_("Until"), required=False)
+
+
+class ImportForm(forms.Form):
+    """CSV file of Debts to import."""
+
+    file = forms.FileField(
+        label=_("CSV file"),
+        help_text=_(
+            "Columns: date, name, creditor, value, debitors, and optionally "
+            "description. Debitors are usernames separated by spaces, each with an "
+            'optional number of parts after a colon, eg. "alice bob:2".',
+        ),
+    )
+
+
+class BasePartFormSet(BaseInlineFormSet):
+    """Parts of a Debt, whose debitor choices are fetched once for all forms."""
+
+    def __init__(self, *args, **kwargs):
+        """Fetch the debitor choices."""
+        super().__init__(*args, **kwargs)
+        self.debitors = list(self.form.base_fields["debitor"].choices)
+
+    def add_fields(self, form, index):
+        """Share the debitor choices."""
+        super().add_fields(form, index)
+        form.fields["debitor"].choices = self.debitors
+
+
+PartFormSet = inlineformset_factory(
+    Debt,
+    Part,
+    form=PartForm,
+    formset=BasePartFormSet,
+    extra=3,
+    can_delete=True,
+)
+
+
+class PartsForm(forms.Form):
+    """Form to add the same Part to many debitors."""
+
+    debitors = forms.ModelMultipleChoiceField(
+        User.objects.all(),
+        label=_("Debitors"),
+        widget=forms.CheckboxSelectMultiple,
+    )
+    part = forms.FloatField(label=_("Part"), initial=1)
+    description = forms.CharField(
+        label=_("Description"),
+        max_length=1000,
+        required=False,
+    )
+
+    def get_parts(self) -> list[Part]:
+        """Build the unsaved Parts."""
+        return [
+            Part(
+                debitor=debitor,
+                part=self.cleaned_data["part"],
+                description=self.cleaned_data["description"],
+            )
+            for debitor in self.cleaned_data["debitors"]
+        ]
+
+
+class BulkForm(forms.Form):
+    """Form of an item of a bulk request, whose users are looked up in a dict.
+
+    The users of the whole request are fetched at once, by username.
+    """
+
+    def __init__(self, *args, users: dict[str, User], **kwargs):
+        """Keep the users of the request."""
+        super().__init__(*args, **kwargs)
+        self.users = users
+
+    def clean_user(self, name: str) -> User:
+        """Get the user from the username in a field."""
+        if (user := self.users.get(self.cleaned_data[name])) is None:
+            raise forms.ValidationError(_("Unknown user"), code="invalid_choice")
+        return user
+
+
+class BulkPartForm(BulkForm):
+    """Part of a BulkDebtForm, with the username of its debitor."""
+
+    debitor = forms.CharField(label=_("Debitor"))
+    part = forms.FloatField(label=_("Part"), required=False)
+    description = forms.CharField(
+        label=_("Description"),
+        max_length=1000,
+        required=False,
+    )
+
+    def clean_debitor(self) -> User:
+        """Get the debitor."""
+        return self.clean_user("debitor")
+
+    def clean_part(self) -> float:
+        """Default to 1 part."""
+        return 1 if self.cleaned_data["part"] is None else self.cleaned_data["part"]
+
+    def get_part(self, debt: Debt) -> Part:
+        """Build the unsaved Part."""
+        return Part(debt=debt, **self.cleaned_data)
+
+
+class BulkDebtForm(BulkForm):
+    """Debt of a bulk request, with the username of its creditor."""
+
+    name = forms.CharField(label=_("Name"), max_length=200)
+    date = forms.DateTimeField(label=_("Date"), required=False)
+    creditor = forms.CharField(label=_("Creditor"))
+    description = forms.CharField(label=_("Description"), required=False)
+    value = forms.DecimalField(label=_("Value"), max_digits=8, decimal_places=2)
+
+    def clean_creditor(self) -> User:
+        """Get the creditor."""
+        return self.clean_user("creditor")
+
+    def clean_date(self):
+        """Default to now."""
+        return self.cleaned_data["date"] or timezone.now()
+
+    def get_debt(self) -> Debt:
+        """Build the unsaved Debt."""
+        return Debt(**self.cleaned_data)
+
+
 class ShareForm(ModelForm):
     """Form for Share."""
 
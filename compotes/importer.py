@@ -0,0 +1,156 @@
+"""Import debts with their parts from CSV files, like bank statements."""
+
+import csv
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import chain
+
+from django.utils.translation import gettext_lazy as _
+
+from actions.models import Action
+
+from . import ledger
+from .forms import BulkDebtForm, BulkPartForm
+from .models import Debt, Part, User
+
+CHUNK_SIZE = 100
+COLUMNS = ["date", "name", "creditor", "value", "debitors"]
+
+
+class Users(dict):
+    """Users by username, with None for unknown usernames."""
+
+    def fetch(self, names: Iterable[str | None]):
+        """Fetch the users of the usernames which were never looked up."""
+        if missing := {name for name in names if name} - self.keys():
+            self.update(dict.fromkeys(missing))
+            self.update(User.objects.in_bulk(missing, field_name="username"))
+
+
+@dataclass
+class Report:
+    """Pks of the imported Debts, and errors of the skipped rows, by line."""
+
+    debts: list[int] = field(default_factory=list)
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+def create_debts(
+    user: User,
+    forms: list[tuple[BulkDebtForm, list[BulkPartForm]]],
+) -> tuple[list[Debt], list[list[Part]]]:
+    """Create the Debts and Parts of valid forms, and log their Actions by user.
+
+    They are not recomputed: the caller has to mark them dirty in ledger.deferred().
+    """
+    debts = Debt.objects.bulk_create(
+        debt_form.get_debt() for debt_form, _part_forms in forms
+    )
+    parts = [
+        [part_form.get_part(debt) for part_form in part_forms]
+        for debt, (_debt_form, part_forms) in zip(debts, forms, strict=True)
+    ]
+    Part.objects.bulk_create(chain.from_iterable(parts))
+    Action.objects.bulk_create(
+        (Action.log(user, "C", obj) for obj in chain(debts, *parts)),
+        batch_size=1000,
+    )
+    ledger.bump()  # bulk_create sends no post_save signal
+    return debts, parts
+
+
+def get_parts(debitors: str | None) -> list[dict[str, str]]:
+    """Parse the debitors column, like "alice bob:2"."""
+    parts = []
+    for item in (debitors or "").split():
+        debitor, _colon, part = item.partition(":")
+        parts.append({"debitor": debitor, "part": part})
+    return parts
+
+
+def get_errors(debt: BulkDebtForm, parts: list[BulkPartForm]) -> list[str]:
+    """Describe the errors of a row."""
+    errors = [
+        f"{name}: {message}"
+        for name, messages in debt.errors.items()
+        for message in messages
+    ]
+    if not parts:
+        errors.append(f"debitors: {_('No debitors')}")
+    for part in parts:
+        errors.extend(
+            f"debitors: {part.data['debitor']}: {message}"
+            for messages in part.errors.values()
+            for message in messages
+        )
+    return errors
+
+
+def read(lines: Iterable[str]) -> Iterator[tuple[int, dict, list[dict]]]:
+    """Get the line number, debt and parts of each row.
+
+    Raise a ValueError if columns are missing.
+    """
+    reader = csv.DictReader(lines)
+    if missing := [name for name in COLUMNS if name not in (reader.fieldnames or [])]:
+        msg = f"Missing columns: {', '.join(missing)}"
+        raise ValueError(msg)
+    for row in reader:
+        yield reader.line_num, row, get_parts(row["debitors"])
+
+
+def import_chunk(
+    chunk: list[tuple[int, dict, list[dict]]],
+    user: User,
+    users: Users,
+    report: Report,
+):
+    """Import the valid rows of a chunk in one transaction, and report the others."""
+    users.fetch(
+        chain.from_iterable(
+            [row["creditor"], *(part["debitor"] for part in parts)]
+            for _line, row, parts in chunk
+        ),
+    )
+    valid = []
+    for line, row, parts in chunk:
+        forms = (
+            BulkDebtForm(row, users=users),
+            [BulkPartForm(part, users=users) for part in parts],
+        )
+        if errors := get_errors(*forms):
+            report.errors.extend((line, error) for error in errors)
+        else:
+            valid.append(forms)
+    with ledger.deferred() as dirty:
+        debts, _parts = create_debts(user, valid)
+        dirty.debts.update(debt.pk for debt in debts)
+    report.debts.extend(debt.pk for debt in debts)
+
+
+def import_debts(
+    lines: Iterable[str],
+    user: User,
+    chunk_size: int = CHUNK_SIZE,
+) -> Report:
+    """Import the valid rows of a CSV file, and report the others.
+
+    Raise a ValueError if columns are missing. A line which can't be decoded or
+    parsed is reported, and stops the import after the rows before it.
+    """
+    report = Report()
+    users = Users()
+    chunk: list[tuple[int, dict, list[dict]]] = []
+    line = 0
+    try:
+        for row in read(lines):
+            line = row[0]
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                import_chunk(chunk, user, users, report)
+                chunk = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.errors.append((line + 1, str(e)))
+    if chunk:
+        import_chunk(chunk, user, users, report)
+    return report
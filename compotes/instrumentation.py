@@ -0,0 +1,116 @@
+"""Measure the SQL queries and the rendering of each request."""
+
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Record:
+    """Durations and statements of the SQL queries run while recording."""
+
+    queries: list[tuple[float, str]] = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Time a query, as an execute wrapper."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((perf_counter() - start, sql))
+
+    def __len__(self) -> int:
+        """Count queries."""
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        """Get the total duration of the queries."""
+        return sum(seconds for seconds, _ in self.queries)
+
+    def slowest(self, n: int) -> list[tuple[float, str]]:
+        """Get the n slowest queries."""
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:n]
+
+
+@contextmanager
+def record(using: str = DEFAULT_DB_ALIAS) -> Iterator[Record]:
+    """Record the SQL queries run on a database."""
+    queries = Record()
+    with connections[using].execute_wrapper(queries):
+        yield queries
+
+
+class InstrumentationMiddleware:
+    """Measure, report and log the SQL queries and the rendering of requests."""
+
+    def __init__(self, get_response):
+        """Configure the middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Measure a request."""
+        start = perf_counter()
+        with record() as queries:
+            response = self.get_response(request)
+        seconds = perf_counter() - start
+        render = getattr(response, "render_seconds", 0)
+        response["Server-Timing"] = ", ".join(
+            (
+                f'sql;dur={queries.seconds * 1000:.1f};desc="{len(queries)} queries"',
+                f"render;dur={render * 1000:.1f}",
+                f"total;dur={seconds * 1000:.1f}",
+            ),
+        )
+
+        slow = (
+            len(queries) > settings.INSTRUMENTATION_MAX_QUERIES
+            or seconds > settings.INSTRUMENTATION_MAX_SECONDS
+        )
+        match = request.resolver_match
+        logger.log(
+            logging.WARNING if slow else logging.DEBUG,
+            "%s %s: %d queries in %.3f s, rendered in %.3f s, %.3f s in total",
+            request.method,
+            request.path,
+            len(queries),
+            queries.seconds,
+            render,
+            seconds,
+            extra={
+                "instrumentation": {
+                    "view": match.view_name if match else None,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "queries": len(queries),
+                    "sql_seconds": queries.seconds,
+                    "render_seconds": render,
+                    "seconds": seconds,
+                    "slowest": [
+                        {"seconds": duration, "sql": sql}
+                        for duration, sql in queries.slowest(
+                            settings.INSTRUMENTATION_SLOWEST,
+                        )
+                    ],
+                },
+            },
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of a template, which happens after this hook."""
+        start = perf_counter()
+
+        def timed(response):
+            response.render_seconds = perf_counter() - start
+
+        response.add_post_render_callback(timed)
+        return response
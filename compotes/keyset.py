@@ -0,0 +1,89 @@
+"""Keyset pagination."""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Sequence
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Max, Q, QuerySet
+
+
+def get_field(model, path: str):
+    """Get the model field at the end of a lookup path."""
+    *relations, name = path.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+
+def encode(values: Sequence) -> str:
+    """Get an opaque cursor from the values of the ordering fields of a row.
+
+    str() keeps the microseconds of datetimes, unlike DjangoJSONEncoder.
+    """
+    return urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode(queryset: QuerySet, ordering: Sequence[str], cursor: str) -> list | None:
+    """Get back the values of the ordering fields, or None if cursor is invalid."""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+        values = [
+            get_field(queryset.model, field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, values, strict=True)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        return None
+    return None if None in values else values
+
+
+def after(ordering: Sequence[str], values: Sequence) -> Q:
+    """Get the condition selecting the rows coming after values in ordering."""
+    names = [field.lstrip("-") for field in ordering]
+    conditions = []
+    for i, field in enumerate(ordering):
+        lookup = "lt" if field.startswith("-") else "gt"
+        equal = dict(zip(names[:i], values[:i], strict=True))
+        conditions.append(Q(**equal, **{f"{names[i]}__{lookup}": values[i]}))
+    return reduce(or_, conditions)
+
+
+def paginate(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    cursor: str | None = None,
+    size: int = 25,
+) -> tuple[list, str | None]:
+    """Get the page starting after cursor, and the cursor of the next page."""
+    queryset = queryset.order_by(*ordering)
+    if cursor and (values := decode(queryset, ordering, cursor)) is not None:
+        queryset = queryset.filter(after(ordering, values))
+    page = list(queryset[: size + 1])
+    if len(page) <= size:
+        return page, None
+    page = page[:size]
+    getters = [attrgetter(field.lstrip("-").replace("__", ".")) for field in ordering]
+    return page, encode([getter(page[-1]) for getter in getters])
+
+
+def estimate(queryset: QuerySet) -> int | None:
+    """Estimate the number of rows of an unfiltered queryset, without counting them.
+
+    This is the number of rows in the statistics of PostgreSQL, and the largest pk
+    elsewhere: deleted rows are still counted.
+    """
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] >= 0 else None  # -1 before any ANALYZE
+    return queryset.aggregate(Max("pk"))["pk__max"] or 0
@@ -0,0 +1,88 @@
+"""Coalesce the recomputations of the ledger within a transaction."""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+@dataclass
+class Dirty:
+    """Pks of the objects to recompute."""
+
+    debts: set[int] = field(default_factory=set)
+    pools: set[int] = field(default_factory=set)
+    users: set[int] = field(default_factory=set)
+
+
+DIRTY: ContextVar[Dirty | None] = ContextVar("dirty", default=None)
+PENDING: ContextVar[list | None] = ContextVar("pending", default=None)
+VERSION = "ledger-version"
+
+
+def current() -> Dirty | None:
+    """Get the dirty objects of the current deferred block, if any."""
+    return DIRTY.get()
+
+
+@contextmanager
+def deferred() -> Iterator[Dirty]:
+    """Run this block in a transaction, and recompute dirty objects at its end."""
+    dirty = DIRTY.get()
+    if dirty is not None:
+        with transaction.atomic():
+            yield dirty
+        return
+    dirty = Dirty()
+    token = DIRTY.set(dirty)
+    try:
+        with transaction.atomic():
+            yield dirty
+            DIRTY.reset(token)
+            token = None
+            flush(dirty)
+    finally:
+        if token is not None:
+            DIRTY.reset(token)
+
+
+def flush(dirty: Dirty):
+    """Recompute dirty Debts and Pools, and then the balances of their users."""
+    from .models import recompute
+
+    if dirty.debts or dirty.pools or dirty.users:
+        recompute(debts=dirty.debts, pools=dirty.pools, users=dirty.users)
+
+
+def version() -> int:
+    """Get the current version of the ledger."""
+    return cache.get_or_set(VERSION, time.time_ns, timeout=None)
+
+
+def set_version():
+    """Set a new version of the ledger.
+
+    Nanoseconds since the epoch keep increasing, even if the cache lost the version.
+    """
+    cache.set(VERSION, time.time_ns(), timeout=None)
+
+
+def bump():
+    """Change the version of the ledger when the current transaction commits.
+
+    The new version is only set once per transaction, whatever its number of writes.
+    """
+    hooks = transaction.get_connection().run_on_commit
+    if PENDING.get() is not hooks:
+        PENDING.set(hooks)
+        transaction.on_commit(commit)
+
+
+def commit():
+    """Set the new version of a committed transaction."""
+    PENDING.set(None)
+    set_version()
@@ -0,0 +1,17 @@
+"""Balance checkpoint management command."""
+
+from django.core.management.base import BaseCommand
+
+from compotes.models import BalanceHistory, User
+
+
+class Command(BaseCommand):
+    """Balance checkpoint management command."""
+
+    help = "add the current balance of all users to their balance history"
+
+    def handle(self, *args, **options):
+        """Balance checkpoint management command."""
+        balances = User.objects.values_list("pk", "balance").iterator(chunk_size=1000)
+        count = BalanceHistory.record(balances, checkpoint=True)
+        self.stdout.write(f"{count} checkpoint(s) added")
@@ -0,0 +1,76 @@
+"""Benchmark management command."""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from compotes.benchmark import run
+
+
+class Command(BaseCommand):
+    """Benchmark management command."""
+
+    help = "time model saves and views on synthetic ledgers, and save results as JSON"
+
+    def add_arguments(self, parser):
+        """Configure the ledgers and the output."""
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[100, 1000],
+            help="numbers of debts of the synthetic ledgers",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="random seed")
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="keep the best time of this number of runs",
+        )
+        parser.add_argument(
+            "--parts",
+            type=int,
+            default=20,
+            help="maximal number of parts of a debt",
+        )
+        parser.add_argument(
+            "--shares",
+            type=int,
+            default=20,
+            help="maximal number of shares of a pool",
+        )
+        parser.add_argument(
+            "--label",
+            default="",
+            help="name of this run, eg. a commit",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="JSON file for the results",
+        )
+
+    def handle(self, *args, sizes, seed, repeat, parts, shares, label, output, **kw):
+        """Benchmark management command."""
+        results = run(sizes, seed, repeat, parts=parts, shares=shares)
+        for result in results:
+            self.stdout.write(
+                "{size:>7} {scenario:<15} {seconds:10.4f} s {queries:6} queries".format(
+                    **result,
+                ),
+            )
+        if output:
+            output.write_text(
+                json.dumps(
+                    {
+                        "label": label,
+                        "seed": seed,
+                        "date": timezone.now().isoformat(),
+                        "results": results,
+                    },
+                    indent=2,
+                ),
+            )
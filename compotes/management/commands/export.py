@@ -0,0 +1,57 @@
+"""Export management command."""
+
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from compotes.export import CHUNK_SIZE, EXPORTS, FORMATS, get_queryset, stream
+
+
+class Command(BaseCommand):
+    """Export management command."""
+
+    help = "stream the rows of a model as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        """Configure the export."""
+        parser.add_argument("name", choices=EXPORTS)
+        parser.add_argument("--format", choices=FORMATS, default="csv", dest="fmt")
+        parser.add_argument("--since", default="", help="first date, included")
+        parser.add_argument("--until", default="", help="last date, excluded")
+        parser.add_argument(
+            "--filter",
+            default="",
+            dest="query",
+            help='DebtFilter parameters, as a query string, eg. "user=a&debt=gift"',
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="number of rows fetched at once",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="file to write, instead of the standard output",
+        )
+
+    def handle(
+        self, *args, name, fmt, since, until, query, chunk_size, output, **options
+    ):
+        """Export management command."""
+        data = QueryDict(query, mutable=True)
+        data.update({"since": since, "until": until})
+        try:
+            queryset = get_queryset(EXPORTS[name], data)
+        except ValidationError as e:
+            raise CommandError(" ".join(e.messages)) from e
+        lines = stream(EXPORTS[name], queryset, fmt, chunk_size)
+        if output:
+            with output.open("w", newline="") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
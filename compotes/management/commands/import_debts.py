@@ -0,0 +1,57 @@
+"""Import debts management command."""
+
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from compotes.importer import CHUNK_SIZE, import_debts
+from compotes.models import User
+
+
+class Command(BaseCommand):
+    """Import debts management command."""
+
+    help = "import debts with their parts from a CSV file, and report skipped rows"
+
+    def add_arguments(self, parser):
+        """Configure the import."""
+        parser.add_argument(
+            "file",
+            type=Path,
+            help='CSV file, or "-" for the standard input',
+        )
+        parser.add_argument(
+            "--user",
+            required=True,
+            metavar="USERNAME",
+            help="author of the Actions of the imported debts",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="number of rows created in each transaction",
+        )
+
+    def handle(self, *args, file, user, chunk_size, **options):
+        """Import debts management command."""
+        try:
+            author = User.objects.get(username=user)
+        except User.DoesNotExist as e:
+            msg = f"Unknown user {user}"
+            raise CommandError(msg) from e
+        try:
+            if str(file) == "-":
+                report = import_debts(sys.stdin, author, chunk_size)
+            else:
+                with file.open(newline="", encoding="utf-8-sig") as f:
+                    report = import_debts(f, author, chunk_size)
+        except (OSError, ValueError) as e:
+            raise CommandError(e) from e
+        for line, error in report.errors:
+            self.stderr.write(f"line {line}: {error}")
+        self.stdout.write(
+            f"{len(report.debts)} debt(s) imported, "
+            f"{len({line for line, _ in report.errors})} row(s) skipped",
+        )
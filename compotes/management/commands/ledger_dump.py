@@ -0,0 +1,40 @@
+"""Ledger dump management command."""
+
+import gzip
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from compotes.snapshot import CHUNK_SIZE, dump
+
+
+class Command(BaseCommand):
+    """Ledger dump management command."""
+
+    help = "dump a snapshot of the ledger, as JSON Lines"
+
+    def add_arguments(self, parser):
+        """Configure the dump."""
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="number of rows fetched at once",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="file to write, compressed if it ends in .gz, "
+            "instead of the standard output",
+        )
+
+    def handle(self, *args, chunk_size, output, **options):
+        """Ledger dump management command."""
+        lines = dump(chunk_size)
+        if output:
+            opener = gzip.open if output.suffix == ".gz" else open
+            with opener(output, "wt") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,44 @@
+"""Ledger load management command."""
+
+import gzip
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from compotes.snapshot import CHUNK_SIZE, load
+
+
+class Command(BaseCommand):
+    """Ledger load management command."""
+
+    help = "load a snapshot of ledger_dump into an empty ledger, and recompute it"
+
+    def add_arguments(self, parser):
+        """Configure the load."""
+        parser.add_argument(
+            "snapshot",
+            type=Path,
+            help="file to read, compressed if it ends in .gz, "
+            'or "-" for the standard input',
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="number of rows created at once",
+        )
+
+    def handle(self, *args, snapshot, chunk_size, **options):
+        """Ledger load management command."""
+        try:
+            if str(snapshot) == "-":
+                counts = load(sys.stdin, chunk_size)
+            else:
+                opener = gzip.open if snapshot.suffix == ".gz" else open
+                with opener(snapshot, "rt") as f:
+                    counts = load(f, chunk_size)
+        except (OSError, ValueError) as e:
+            raise CommandError(e) from e
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count} row(s) loaded")
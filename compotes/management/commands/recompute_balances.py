@@ -0,0 +1,36 @@
+"""Recompute balances management command."""
+
+from django.core.management.base import BaseCommand
+
+from compotes.models import User, recompute_balances
+
+
+class Command(BaseCommand):
+    """Recompute balances management command."""
+
+    help = "recompute all balances from scratch, and fix those which are wrong"
+
+    def add_arguments(self, parser):
+        """Select users, and allow to only report."""
+        parser.add_argument(
+            "--users",
+            nargs="+",
+            metavar="USERNAME",
+            help="only recompute the balances of these users",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="report wrong balances, but do not fix them",
+        )
+
+    def handle(self, *args, users=None, dry_run=False, **options):
+        """Recompute balances management command."""
+        queryset = User.objects.all()
+        if users:
+            queryset = queryset.filter(username__in=users)
+        changed = recompute_balances(queryset, commit=not dry_run)
+        for user, balance in changed:
+            self.stdout.write(f"{user!r}: {balance:.2f} → {user.balance:.2f} €")
+        verb = "to fix" if dry_run else "fixed"
+        self.stdout.write(f"{len(changed)} wrong balance(s) {verb}")
@@ -1,6 +1,8 @@
 """Reminder management command."""
 
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from compotes.models import User
 
@@ -8,9 +10,35 @@ from compotes.models import User
 class Command(BaseCommand):
     """Reminder management command."""
 
-    help = "run User.reminder() for all users"
+    help = "run User.reminder() for all users with a balance, and send the mails"
 
-    def handle(self, *args, **options):
+    def add_arguments(self, parser):
+        """Configure delivery and dry runs."""
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="pause between two mails to the same host",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="list the users who would be reminded, without sending anything",
+        )
+
+    def handle(self, *args, delay, dry_run, **options):
         """Reminder management command."""
-        for user in User.objects.all():
-            user.reminder()
+        count = 0
+        with transaction.atomic():
+            for user in User.objects.exclude(balance=0).iterator():
+                count += 1
+                if dry_run:
+                    self.stdout.write(f"{user!r}: {user.balance:.2f} €")
+                else:
+                    user.reminder()
+        if dry_run:
+            self.stdout.write(f"{count} reminder(s) to send")
+            return
+        self.stdout.write(f"{count} reminder(s) queued")
+        call_command("send_mails", delay=delay, stdout=self.stdout)
@@ -0,0 +1,60 @@
+"""Send mails management command."""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from compotes.spool import deliver
+
+
+class Command(BaseCommand):
+    """Send mails management command."""
+
+    help = "send the pending mails of the spool"
+
+    def add_arguments(self, parser):
+        """Configure the thread pool, rate limits and retries."""
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="number of hosts served at the same time",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="pause between two mails to the same host",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=5,
+            help="give up a mail after this number of failures",
+        )
+        parser.add_argument(
+            "--backoff",
+            type=int,
+            default=5,
+            metavar="MINUTES",
+            help="postpone the first retry of a mail, then double it",
+        )
+        parser.add_argument(
+            "--lease",
+            type=int,
+            default=60,
+            metavar="MINUTES",
+            help="keep other deliveries from sending the mails claimed here",
+        )
+
+    def handle(self, *args, threads, delay, max_attempts, backoff, lease, **options):
+        """Send mails management command."""
+        sent, failed = deliver(
+            threads=threads,
+            delay=delay,
+            max_attempts=max_attempts,
+            backoff=timedelta(minutes=backoff),
+            lease=timedelta(minutes=lease),
+        )
+        self.stdout.write(f"{sent} mail(s) sent, {failed} failed")
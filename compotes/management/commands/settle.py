@@ -0,0 +1,30 @@
+"""Settle management command."""
+
+from django.core.management.base import BaseCommand
+
+from compotes.models import User
+from compotes.settlement import EXACT_LIMIT, settle_users
+
+
+class Command(BaseCommand):
+    """Settle management command."""
+
+    help = "list transfers which would settle all balances"
+
+    def add_arguments(self, parser):
+        """Configure the exact algorithm."""
+        parser.add_argument(
+            "--exact-limit",
+            type=int,
+            default=EXACT_LIMIT,
+            help="minimize transfers exactly up to this number of users",
+        )
+
+    def handle(self, *args, exact_limit, **options):
+        """Settle management command."""
+        transfers = settle_users(User.objects.all(), exact_limit=exact_limit)
+        for transfer in transfers:
+            self.stdout.write(
+                f"{transfer.payer!r} → {transfer.payee!r}: {transfer.value:.2f} €",
+            )
+        self.stdout.write(f"{len(transfers)} transfer(s)")
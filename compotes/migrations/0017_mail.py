@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compotes', '0016_user_respo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+                ('to', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=250)),
+                ('message', models.TextField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_try', models.DateTimeField(default=django.utils.timezone.now, null=True)),
+                ('sent', models.DateTimeField(null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Mail',
+                'indexes': [models.Index(fields=['sent', 'next_try'], name='compotes_ma_sent_f7e7a7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS = "compotes_debtsearch_fts"
+SQLITE = [
+    f"""CREATE VIRTUAL TABLE {FTS} USING fts5(
+        users, text, content='compotes_debtsearch', content_rowid='debt_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {FTS}_insert AFTER INSERT ON compotes_debtsearch BEGIN
+        INSERT INTO {FTS}(rowid, users, text)
+        VALUES (new.debt_id, new.users, new.text);
+    END""",
+    f"""CREATE TRIGGER {FTS}_delete AFTER DELETE ON compotes_debtsearch BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, users, text)
+        VALUES ('delete', old.debt_id, old.users, old.text);
+    END""",
+    f"""CREATE TRIGGER {FTS}_update AFTER UPDATE ON compotes_debtsearch BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, users, text)
+        VALUES ('delete', old.debt_id, old.users, old.text);
+        INSERT INTO {FTS}(rowid, users, text)
+        VALUES (new.debt_id, new.users, new.text);
+    END""",
+]
+
+
+def get_indexes():
+    """Get the GIN indexes of PostgreSQL, matching compotes.search.PostgresSearch."""
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        GinIndex(
+            SearchVector(column, config="simple"),
+            name=f"compotes_debtsearch_{column}_gin",
+        )
+        for column in ("users", "text")
+    ]
+
+
+def create_index(apps, schema_editor):
+    """Create the full-text index of the database, if it has one."""
+    DebtSearch = apps.get_model("compotes", "DebtSearch")
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == "postgresql":
+        for index in get_indexes():
+            schema_editor.add_index(DebtSearch, index)
+
+
+def drop_index(apps, schema_editor):
+    """Drop the full-text index of the database, if it has one."""
+    DebtSearch = apps.get_model("compotes", "DebtSearch")
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE {FTS}")
+    elif schema_editor.connection.vendor == "postgresql":
+        for index in get_indexes():
+            schema_editor.remove_index(DebtSearch, index)
+
+
+def backfill(apps, schema_editor):
+    """Fill the documents of the existing Debts, like DebtSearch.index()."""
+    Debt = apps.get_model("compotes", "Debt")
+    DebtSearch = apps.get_model("compotes", "DebtSearch")
+    docs = []
+    debts = Debt.objects.select_related("creditor").prefetch_related("part_set__debitor")
+    for debt in debts.iterator(chunk_size=1000):
+        users = {debt.creditor, *(part.debitor for part in debt.part_set.all())}
+        docs.append(
+            DebtSearch(
+                debt=debt,
+                users=" ".join(
+                    f"{user.username} {user.first_name} {user.last_name}"
+                    for user in sorted(users, key=lambda user: user.pk)
+                ),
+                text=f"{debt.name} {debt.description}",
+            ),
+        )
+    DebtSearch.objects.bulk_create(docs, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compotes', '0017_mail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DebtSearch',
+            fields=[
+                ('debt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='compotes.debt')),
+                ('users', models.TextField()),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
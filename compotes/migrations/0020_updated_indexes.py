@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compotes', '0019_user_lower_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['updated'], name='compotes_de_updated_a73e3c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pool',
+            index=models.Index(fields=['updated'], name='compotes_po_updated_9d6a02_idx'),
+        ),
+    ]
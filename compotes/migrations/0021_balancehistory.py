@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def checkpoint(apps, schema_editor):
+    """Start the history of each user with its current balance."""
+    User = apps.get_model("compotes", "User")
+    BalanceHistory = apps.get_model("compotes", "BalanceHistory")
+    BalanceHistory.objects.bulk_create(
+        (
+            BalanceHistory(user_id=pk, balance=balance, checkpoint=True)
+            for pk, balance in User.objects.values_list("pk", "balance")
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compotes', '0020_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Balance')),
+                ('checkpoint', models.BooleanField(default=False, verbose_name='Checkpoint')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Balance history',
+                'indexes': [models.Index(fields=['user', 'date'], name='compotes_ba_user_id_c8b6eb_idx'), models.Index(fields=['date'], name='compotes_ba_date_87c34a_idx')],
+            },
+        ),
+        migrations.RunPython(checkpoint, migrations.RunPython.noop),
+    ]
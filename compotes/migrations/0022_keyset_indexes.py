@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compotes', '0021_balancehistory'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pool',
+            name='compotes_po_updated_9d6a02_idx',
+        ),
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['date', 'id'], name='compotes_de_date_a810fd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pool',
+            index=models.Index(fields=['updated', 'id'], name='compotes_po_updated_2e0a05_idx'),
+        ),
+    ]
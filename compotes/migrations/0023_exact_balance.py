@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:07
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import Cast, Round
+
+
+def exact_balances(apps, schema_editor):
+    """Compute the exact balance of each user from its whole history."""
+    User = apps.get_model("compotes", "User")
+    micros = Cast(
+        Round(Cast(F("value") * 10**6, models.DecimalField(max_digits=20, decimal_places=6)), 0),
+        models.BigIntegerField(),
+    )
+    balances = defaultdict(int)
+    for model, field, sign, exclude in (
+        ("Debt", "creditor", 1, {"part_value": 0}),
+        ("Part", "debitor", -1, {}),
+        ("Pool", "organiser", 1, {"ratio": 0}),
+        ("Share", "participant", -1, {}),
+    ):
+        queryset = apps.get_model("compotes", model).objects.exclude(**exclude)
+        sums = queryset.order_by().values_list(field).annotate(total=Sum(micros))
+        for pk, value in sums:
+            balances[pk] += sign * value
+    users = list(User.objects.only("pk"))
+    for user in users:
+        user.exact_balance = balances[user.pk]
+    User.objects.bulk_update(users, ["exact_balance"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compotes', '0022_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='exact_balance',
+            field=models.BigIntegerField(default=0, editable=False, help_text='in millionths of €, before rounding to cents', verbose_name='Exact balance'),
+        ),
+        migrations.RunPython(exact_balances, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,180 @@
 """Compotes models."""
 
-from smtplib import SMTPException
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from operator import attrgetter
 
 from autoslug import AutoSlugField  # type: ignore
-from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.core.mail import mail_admins
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Lower, NullIf, Round
+from django.db.models.signals import post_delete, post_save
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from dmdm import send_mail
 from ndh.models import Links, NamedModel, TimeStampedModel
 from ndh.utils import query_sum
 
+from . import ledger
+
+CENT = Decimal("0.01")
+MICROS = 10**6
+SEARCHED = {"username", "first_name", "last_name"}
+
+
+def micros(field: str) -> Cast:
+    """Convert a value column to an integer number of millionths of €.
+
+    The incremental and the full computations of balances both sum these integers,
+    so that they agree exactly, whatever the precision of the database.
+    """
+    value = Cast(
+        F(field) * MICROS, models.DecimalField(max_digits=20, decimal_places=6)
+    )
+    return Cast(Round(value, 0), models.BigIntegerField())
+
+
+def to_cents(exact_balance: int) -> Decimal:
+    """Round an exact balance, in millionths of €, to cents."""
+    return (Decimal(exact_balance) / MICROS).quantize(CENT, ROUND_HALF_UP)
+
+
+def update_balances(before: dict[int, int], after: dict[int, int]):
+    """Apply the difference between two balance snapshots to the users.
+
+    Snapshots map user pks to what an object brings to their exact balance, as given
+    by Debt.get_balances and Pool.get_balances. Only the signed deltas are written,
+    with atomic F() updates, so the cost does not depend on the users history.
+    """
+    changed = []
+    for pk in before.keys() | after.keys():
+        delta = after.get(pk, 0) - before.get(pk, 0)
+        if delta:
+            User.objects.filter(pk=pk).update(exact_balance=F("exact_balance") + delta)
+            changed.append(pk)
+    rounded = []
+    for user in User.objects.filter(pk__in=changed).only("balance", "exact_balance"):
+        balance = to_cents(user.exact_balance)
+        if balance != user.balance:
+            user.balance = balance
+            rounded.append(user)
+    if rounded:
+        User.objects.bulk_update(rounded, ["balance"])
+        BalanceHistory.record((user.pk, user.balance) for user in rounded)
+
+
+def compute_balances(users: QuerySet) -> dict[int, int]:
+    """Recompute the exact balances of some users, with one aggregate per model."""
+    balances: dict[int, int] = defaultdict(int)
+    for queryset, field, sign in (
+        (Debt.objects.exclude(part_value=0), "creditor", 1),
+        (Part.objects.all(), "debitor", -1),
+        (Pool.objects.exclude(ratio=0), "organiser", 1),
+        (Share.objects.all(), "participant", -1),
+    ):
+        sums = (
+            queryset.filter(**{f"{field}__in": users.values("pk")})
+            .order_by()
+            .values_list(field)
+            .annotate(total=Sum(micros("value")))
+        )
+        for pk, value in sums:
+            balances[pk] += sign * value
+    return balances
+
+
+def recompute_balances(
+    users: QuerySet,
+    commit: bool = True,
+) -> list[tuple["User", Decimal]]:
+    """Recompute the balances of some users, and save those which were wrong.
+
+    Return those users, with their previous balance.
+    """
+    balances = compute_balances(users)
+    changed = []
+    for user in users:
+        exact_balance = balances[user.pk]
+        balance = to_cents(exact_balance)
+        if (exact_balance, balance) != (user.exact_balance, user.balance):
+            changed.append((user, user.balance))
+            user.exact_balance, user.balance = exact_balance, balance
+    if commit and changed:
+        User.objects.bulk_update(
+            [user for user, _ in changed],
+            ["balance", "exact_balance"],
+            batch_size=1000,
+        )
+        BalanceHistory.record(
+            (user.pk, user.balance)
+            for user, balance in changed
+            if user.balance != balance
+        )
+        ledger.bump()
+    return changed
+
+
+def recompute(debts: Iterable[int] = (), pools: Iterable[int] = (), users=()):
+    """Recompute some Debts and Pools, and the balances of the involved users."""
+    debts = Debt.objects.filter(pk__in=debts)
+    parts = Part.objects.filter(debt=OuterRef("pk")).order_by().values("debt")
+    parts = parts.annotate(s=Sum("part")).values("s")
+    debts.update(
+        part_value=Coalesce(
+            Cast("value", models.FloatField()) / NullIf(Subquery(parts), 0.0),
+            0.0,
+        ),
+        updated=timezone.now(),
+    )
+    part_value = Debt.objects.filter(pk=OuterRef("debt")).values("part_value")
+    Part.objects.filter(debt__in=debts).update(value=F("part") * Subquery(part_value))
+    DebtSearch.index(debts)
+
+    pools = Pool.objects.filter(pk__in=pools)
+    maxi = Share.objects.filter(pool=OuterRef("pk")).order_by().values("pool")
+    maxi = maxi.annotate(s=Sum("maxi")).values("s")
+    available = Cast(Subquery(maxi), models.FloatField())
+    pools.update(
+        ratio=Case(
+            When(
+                value__lte=Subquery(maxi),
+                then=Coalesce(
+                    Cast("value", models.FloatField()) / NullIf(available, 0.0),
+                    0.0,
+                ),
+            ),
+            default=0.0,
+        ),
+        updated=timezone.now(),
+    )
+    ratio = Pool.objects.filter(pk=OuterRef("pool")).values("ratio")
+    Share.objects.filter(pool__in=pools).update(
+        value=Cast("maxi", models.FloatField()) * Subquery(ratio),
+    )
+
+    recompute_balances(
+        User.objects.filter(
+            Q(pk__in=users)
+            | Q(pk__in=debts.values("creditor"))
+            | Q(pk__in=Part.objects.filter(debt__in=debts).values("debitor"))
+            | Q(pk__in=pools.values("organiser"))
+            | Q(pk__in=Share.objects.filter(pool__in=pools).values("participant")),
+        ),
+    )
+
 
 class User(Links, AbstractUser):
     """Placeholder."""
@@ -26,6 +186,12 @@ class User(Links, AbstractUser):
         decimal_places=2,
         default=0,
     )
+    exact_balance = models.BigIntegerField(
+        _("Exact balance"),
+        default=0,
+        editable=False,
+        help_text=_("in millionths of €, before rounding to cents"),
+    )
     respo = models.ForeignKey("self", on_delete=models.PROTECT, blank=True, null=True)
 
     class Meta:
@@ -33,6 +199,10 @@ class User(Links, AbstractUser):
 
         ordering = ["username"]
         verbose_name = _("User")
+        indexes = [
+            models.Index(Lower(field), name=f"compotes_user_{field}_lower")
+            for field in ("username", "first_name", "last_name")
+        ]
 
     def get_absolute_url(self) -> str:
         """Get url to this User."""
@@ -51,21 +221,67 @@ class User(Links, AbstractUser):
         return name
 
     def save(self, *args, **kwargs):
-        """Update the balance."""
-        if self.pk:
-            debts = query_sum(
-                self.get_debts(),
-                "value",
-                output_field=models.FloatField(),
-            )
-            parts = query_sum(self.part_set, "value", output_field=models.FloatField())
-            self.balance = self.get_pool_sum() + debts - parts
+        """Recompute the balance from scratch, and the search documents of its Debts.
+
+        Documents are only updated if the names of this user changed.
+        """
+        update_fields = kwargs.get("update_fields")
+        fields = {"balance", *SEARCHED}
+        if update_fields is not None:
+            fields &= set(update_fields)
+            if "balance" in fields:
+                kwargs["update_fields"] = {*update_fields, "exact_balance"}
+        stored = None
+        if self.pk and fields:
+            stored = User.objects.filter(pk=self.pk).values(*fields).first()
+        if stored is not None and "balance" in fields:
+            balances = compute_balances(User.objects.filter(pk=self.pk))
+            self.exact_balance = balances[self.pk]
+            self.balance = to_cents(self.exact_balance)
         super().save(*args, **kwargs)
+        if stored is None:
+            return
+        if "balance" in fields and stored["balance"] != self.balance:
+            BalanceHistory.record([(self.pk, self.balance)])
+        if any(stored[name] != getattr(self, name) for name in fields & SEARCHED):
+            DebtSearch.index(
+                Debt.objects.filter(Q(creditor=self) | Q(part__debitor=self)),
+            )
+
+    def get_balance(self) -> Decimal:
+        """Recompute the balance from the whole history of this user.
+
+        Debts and Pools keep the balances up to date incrementally, so this is only
+        needed to verify or repair them.
+        """
+        return to_cents(compute_balances(User.objects.filter(pk=self.pk))[self.pk])
+
+    def balance_at(self, date: datetime) -> Decimal:
+        """Get the balance of this user at some date, from its history."""
+        history = self.balancehistory_set.filter(date__lte=date).order_by(
+            "-date", "-pk"
+        )
+        return history.values_list("balance", flat=True).first() or Decimal("0.00")
+
+    def balance_history(self, start: datetime, end: datetime) -> list[tuple]:
+        """Get the (date, balance) of this user at start, and of its changes until end.
+
+        This is one index seek for the balance at start, then a range scan.
+        """
+        history = self.balancehistory_set.filter(date__gt=start, date__lte=end)
+        return [
+            (start, self.balance_at(start)),
+            *history.order_by("date").values_list("date", "balance"),
+        ]
 
     def get_debts(self):
         """Get debts excluding those without value."""
         return self.debt_set.exclude(part_value=0)
 
+    def get_parts(self):
+        """Get parts, with their debts."""
+        return self.part_set.select_related("debt")
+
     def get_pool_sum(self):
         """Get sum of Pool participations."""
         pools = query_sum(
@@ -77,20 +293,8 @@ class User(Links, AbstractUser):
         return pools - shares
 
     def send_mail(self, subject, message):
-        """Send a mail to this user."""
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [self.email],
-                reply_to=[settings.ADMINS[0][1]],
-            )
-        except SMTPException:  # pragma: no cover
-            mail_admins(
-                f"SMTP Exception for {self} <{self.email}>",
-                f"{subject=}\n{message=}",
-            )
+        """Queue a mail to this user, for the send_mails management command."""
+        return Mail.objects.create(to=self.email, subject=subject, message=message)
 
     def reminder(self):
         """Remind users of their balance."""
@@ -103,6 +307,23 @@ class User(Links, AbstractUser):
         )
 
 
+class DebtQuerySet(models.QuerySet):
+    """QuerySet for Debts."""
+
+    def with_parts(self) -> "DebtQuerySet":
+        """Annotate the number of debitors and parts, and get the creditor.
+
+        Subqueries are used, so that joins added later, eg. by filters, can't
+        change those numbers.
+        """
+        parts = Part.objects.filter(debt=OuterRef("pk")).order_by().values("debt")
+        debitors = parts.annotate(n=Count("debitor", distinct=True)).values("n")
+        return self.select_related("creditor").annotate(
+            debitors=Coalesce(Subquery(debitors), 0),
+            parts=Coalesce(Subquery(parts.annotate(s=Sum("part")).values("s")), 0.0),
+        )
+
+
 class Debt(Links, TimeStampedModel):
     """Declare a debt amount."""
 
@@ -117,10 +338,16 @@ class Debt(Links, TimeStampedModel):
     part_value = models.FloatField(_("Part value"), default=0)
     description = models.TextField(_("Description"), blank=True)
 
+    objects = DebtQuerySet.as_manager()
+
     class Meta:
         """Meta."""
 
         verbose_name = _("Debt")
+        indexes = [
+            models.Index(fields=["updated"]),
+            models.Index(fields=["date", "id"]),
+        ]
 
     def __str__(self) -> str:
         """Show PK."""
@@ -134,16 +361,62 @@ class Debt(Links, TimeStampedModel):
         """Url to edit self."""
         return reverse("debt_update", kwargs={"pk": self.pk})
 
-    def save(self, *args, **kwargs):
-        """Update part_value, parts, and balances."""
+    @transaction.atomic
+    def save(self, *args, balances=None, **kwargs):
+        """Update part_value, parts, and balances.
+
+        balances is the lock_balances() snapshot taken before the change, if the
+        caller already modified the parts of this Debt.
+        In a ledger.deferred() block, this Debt is only marked for recomputation.
+        """
+        if (dirty := ledger.current()) is not None:
+            if self.pk:
+                stored = Debt.objects.filter(pk=self.pk).values_list("creditor")
+                dirty.users.update(pk for (pk,) in stored)
+            super().save(*args, **kwargs)
+            dirty.debts.add(self.pk)
+            return
+        if balances is None:
+            balances = self.lock_balances() if self.pk else {}
         if self.pk:
             parts = query_sum(self.part_set, "part", output_field=models.FloatField())
             self.part_value = 0 if parts == 0 else float(self.value) / parts
         super().save(*args, **kwargs)
-        for part in self.part_set.all():
-            part.save(allow_recursion=False)
-        for user in User.objects.filter(Q(part__debt=self) | Q(debt=self)):
-            user.save()
+        self.part_set.update(value=F("part") * self.part_value)
+        update_balances(balances, self.get_balances())
+        DebtSearch.index([self.pk])
+
+    def lock_balances(self) -> dict[int, int]:
+        """Lock this Debt until the end of the transaction, and get its balances.
+
+        Concurrent changes of this Debt then take their snapshots one at a time.
+        """
+        list(Debt.objects.select_for_update().filter(pk=self.pk).values_list("pk"))
+        return self.get_balances()
+
+    def get_balances(self) -> dict[int, int]:
+        """Get what this Debt, as stored in the database, brings to each user."""
+        balances: dict[int, int] = defaultdict(int)
+        debt = Debt.objects.filter(pk=self.pk).exclude(part_value=0)
+        for creditor, value in debt.values_list("creditor", micros("value")):
+            balances[creditor] += value
+        parts = self.part_set.order_by().values_list("debitor")
+        for debitor, value in parts.annotate(total=Sum(micros("value"))):
+            balances[debitor] -= value
+        return balances
+
+    @transaction.atomic
+    def add_parts(self, parts: Iterable["Part"]) -> list["Part"]:
+        """Create many Parts at once, and update this Debt and balances only once."""
+        balances = None if ledger.current() else self.lock_balances()
+        parts = list(parts)
+        for part in parts:
+            part.debt = self
+        Part.objects.bulk_create(parts)
+        self.save(balances=balances)
+        for part in parts:
+            part.value = part.part * self.part_value
+        return parts
 
     def get_debitors(self) -> int:
         """Get number of debitors."""
@@ -167,6 +440,8 @@ class Part(models.Model):
     value = models.FloatField(_("Value"), default=0)
     description = models.CharField(_("Description"), max_length=1000, blank=True)
 
+    action_parent = "debt"
+
     class Meta:
         """Meta."""
 
@@ -182,17 +457,82 @@ class Part(models.Model):
             **vars(self),
         }
 
+    @transaction.atomic
     def save(self, *args, allow_recursion=True, **kwargs):
-        """Update value."""
+        """Update value, and trigger debt update."""
+        if (dirty := ledger.current()) is not None:
+            if self.pk:
+                stored = Part.objects.filter(pk=self.pk).values_list("debitor")
+                dirty.users.update(pk for (pk,) in stored)
+            dirty.debts.add(self.debt_id)
+            allow_recursion = False
+        balances = self.debt.lock_balances() if allow_recursion else None
         self.value = self.part * self.debt.part_value
         super().save(*args, **kwargs)
         if allow_recursion:
-            self.debt.save()
+            self.debt.save(balances=balances)
 
     def get_absolute_url(self) -> str:
         """Url to debt."""
         return self.debt.get_absolute_url()
 
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        """Trigger debt update."""
+        if (dirty := ledger.current()) is not None:
+            dirty.debts.add(self.debt_id)
+            dirty.users.add(self.debitor_id)
+            return super().delete(*args, **kwargs)
+        balances = self.debt.lock_balances()
+        ret = super().delete(*args, **kwargs)
+        self.debt.save(balances=balances)
+        return ret
+
+
+class DebtSearch(models.Model):
+    """Search document of a Debt, queried by compotes.search backends."""
+
+    debt = models.OneToOneField(
+        Debt,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search",
+    )
+    users = models.TextField()
+    text = models.TextField()
+
+    def __str__(self):
+        """Describe this document."""
+        return f"{self.users}: {self.text}"
+
+    @classmethod
+    def index(cls, debts: Iterable[int]):
+        """Update the documents of some Debts."""
+        debts = (
+            Debt.objects.filter(pk__in=debts)
+            .select_related("creditor")
+            .prefetch_related("part_set__debitor")
+        )
+        docs = []
+        for debt in debts:
+            users = {debt.creditor, *(part.debitor for part in debt.part_set.all())}
+            docs.append(
+                cls(
+                    debt=debt,
+                    users=" ".join(
+                        f"{user.username} {user.first_name} {user.last_name}"
+                        for user in sorted(users, key=attrgetter("pk"))
+                    ),
+                    text=f"{debt.name} {debt.description}",
+                ),
+            )
+        cls.objects.bulk_create(
+            docs,
+            update_conflicts=True,
+            unique_fields=["debt"],
+            update_fields=["users", "text"],
+        )
+
 
 class Pool(Links, TimeStampedModel, NamedModel):
     """Create a crowd funding."""
@@ -210,6 +550,7 @@ class Pool(Links, TimeStampedModel, NamedModel):
         """Meta."""
 
         verbose_name = _("Pool")
+        indexes = [models.Index(fields=["updated", "id"])]
 
     def get_absolute_url(self) -> str:
         """Url to detail self."""
@@ -223,20 +564,52 @@ class Pool(Links, TimeStampedModel, NamedModel):
         """Url to edit ones Share."""
         return reverse("share_update", kwargs={"slug": self.slug})
 
-    def save(self, *args, **kwargs):
-        """Update ratio, value, shares, and balances."""
+    @transaction.atomic
+    def save(self, *args, balances=None, **kwargs):
+        """Update ratio, value, shares, and balances.
+
+        balances is the lock_balances() snapshot taken before the change, if the
+        caller already modified the shares of this Pool.
+        In a ledger.deferred() block, this Pool is only marked for recomputation.
+        """
+        if (dirty := ledger.current()) is not None:
+            if self.pk:
+                stored = Pool.objects.filter(pk=self.pk).values_list("organiser")
+                dirty.users.update(pk for (pk,) in stored)
+            super().save(*args, **kwargs)
+            dirty.pools.add(self.pk)
+            return
+        if balances is None:
+            balances = self.lock_balances() if self.pk else {}
         if self.pk:
             available = float(self.sum_shares())
             self.ratio = float(self.value) / available if available >= self.value else 0
         super().save(*args, **kwargs)
-        for share in self.share_set.all():
-            share.save(allow_recursion=False)
-        for user in User.objects.filter(Q(share__pool=self) | Q(pool=self)).distinct():
-            user.save()
+        self.share_set.update(value=Cast("maxi", models.FloatField()) * self.ratio)
+        update_balances(balances, self.get_balances())
+
+    def lock_balances(self) -> dict[int, int]:
+        """Lock this Pool until the end of the transaction, and get its balances.
+
+        Concurrent changes of this Pool then take their snapshots one at a time.
+        """
+        list(Pool.objects.select_for_update().filter(pk=self.pk).values_list("pk"))
+        return self.get_balances()
+
+    def get_balances(self) -> dict[int, int]:
+        """Get what this Pool, as stored in the database, brings to each user."""
+        balances: dict[int, int] = defaultdict(int)
+        pool = Pool.objects.filter(pk=self.pk).exclude(ratio=0)
+        for organiser, value in pool.values_list("organiser", micros("value")):
+            balances[organiser] += value
+        shares = self.share_set.values_list("participant", micros("value"))
+        for participant, value in shares:
+            balances[participant] -= value
+        return balances
 
     def real_shares(self):
         """Exclude trivial shares."""
-        return self.share_set.exclude(maxi=0)
+        return self.share_set.exclude(maxi=0).select_related("participant")
 
     def sum_shares(self):
         """Get maxi available amount."""
@@ -259,6 +632,8 @@ class Share(models.Model):
     maxi = models.DecimalField(_("Maxi"), max_digits=8, decimal_places=2, default=0)
     value = models.FloatField(_("Value"), default=0)
 
+    action_parent = "pool"
+
     class Meta:
         """Meta."""
 
@@ -272,13 +647,113 @@ class Share(models.Model):
             f"from {self.participant} for {self.pool}"
         )
 
+    @transaction.atomic
     def save(self, *args, allow_recursion=True, **kwargs):
         """Update value, and trigger pool update."""
+        if (dirty := ledger.current()) is not None:
+            if self.pk:
+                stored = Share.objects.filter(pk=self.pk).values_list("participant")
+                dirty.users.update(pk for (pk,) in stored)
+            dirty.pools.add(self.pool_id)
+            allow_recursion = False
+        balances = self.pool.lock_balances() if allow_recursion else None
         self.value = float(self.maxi) * self.pool.ratio
         super().save(*args, **kwargs)
         if allow_recursion:
-            self.pool.save()
+            self.pool.save(balances=balances)
 
     def get_absolute_url(self) -> str:
         """Return to Pool."""
         return self.pool.get_absolute_url()
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        """Trigger pool update."""
+        if (dirty := ledger.current()) is not None:
+            dirty.pools.add(self.pool_id)
+            dirty.users.add(self.participant_id)
+            return super().delete(*args, **kwargs)
+        balances = self.pool.lock_balances()
+        ret = super().delete(*args, **kwargs)
+        self.pool.save(balances=balances)
+        return ret
+
+
+class BalanceHistory(models.Model):
+    """Append-only history of the balances of users.
+
+    Each change of User.balance adds an entry. Checkpoints are added periodically
+    for all users, by the balance_checkpoint management command.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("User"))
+    date = models.DateTimeField(_("Date"), default=timezone.now)
+    balance = models.DecimalField(_("Balance"), max_digits=8, decimal_places=2)
+    checkpoint = models.BooleanField(_("Checkpoint"), default=False)
+
+    class Meta:
+        """Meta."""
+
+        verbose_name = _("Balance history")
+        indexes = [
+            models.Index(fields=["user", "date"]),
+            models.Index(fields=["date"]),
+        ]
+
+    def __str__(self):
+        """Describe this entry."""
+        return f"{self.user!r}: {self.balance:.2f} €, {self.date:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def record(cls, balances: Iterable[tuple[int, Decimal]], checkpoint=False) -> int:
+        """Add entries for some (user pk, balance), and count them."""
+        now = timezone.now()
+        entries = cls.objects.bulk_create(
+            (
+                cls(user_id=pk, date=now, balance=balance, checkpoint=checkpoint)
+                for pk, balance in balances
+            ),
+            batch_size=1000,
+        )
+        return len(entries)
+
+
+class Mail(TimeStampedModel):
+    """Outgoing mail, spooled until the send_mails management command delivers it."""
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=250)
+    message = models.TextField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_try = models.DateTimeField(default=timezone.now, null=True)
+    sent = models.DateTimeField(null=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        """Meta."""
+
+        verbose_name = _("Mail")
+        indexes = [models.Index(fields=["sent", "next_try"])]
+
+    def __str__(self):
+        """Describe this Mail."""
+        return f"{self.subject} to {self.to}"
+
+    @property
+    def host(self) -> str:
+        """Get the domain of the recipient."""
+        return self.to.rpartition("@")[2].lower()
+
+
+def bump_ledger(sender, update_fields=None, **kwargs):
+    """Change the ledger version, when one of its objects is saved or deleted.
+
+    Logins only save User.last_login, which is not shown.
+    """
+    if update_fields != {"last_login"}:
+        ledger.bump()
+
+
+for model in (User, Debt, Part, Pool, Share):
+    post_save.connect(bump_ledger, sender=model)
+    post_delete.connect(bump_ledger, sender=model)
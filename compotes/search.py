@@ -0,0 +1,70 @@
+"""Full-text search of Debts."""
+
+import re
+
+from django.db import connection
+from django.db.models import FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Debt, DebtSearch
+
+
+def get_terms(value: str) -> list[str]:
+    """Split a search in words, which are safe to put in full-text queries."""
+    return re.findall(r"\w+", value.lower())
+
+
+class Search:
+    """Fallback backend, without index."""
+
+    def filter(self, queryset: QuerySet, column: str, value: str) -> QuerySet:
+        """Filter Debts whose document column contains all the words of value."""
+        for term in get_terms(value):
+            queryset = queryset.filter(**{f"search__{column}__icontains": term})
+        return queryset
+
+
+class SQLiteSearch(Search):
+    """Backend for the FTS5 table of SQLite, with prefix queries and bm25 ranks."""
+
+    table = f"{DebtSearch._meta.db_table}_fts"
+
+    def filter(self, queryset: QuerySet, column: str, value: str) -> QuerySet:
+        """Filter Debts whose document column has words starting like value."""
+        if not (terms := get_terms(value)):
+            return queryset
+        prefixes = " AND ".join(f'"{term}"*' for term in terms)
+        match = f"{column} : ({prefixes})"
+        search = f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s"
+        rank = f"SELECT -rank FROM {self.table} WHERE {self.table} MATCH %s"
+        rank += f" AND rowid = {Debt._meta.db_table}.id"
+        return queryset.filter(pk__in=RawSQL(search, (match,))).annotate(
+            **{f"{column}_rank": RawSQL(rank, (match,), output_field=FloatField())},
+        )
+
+
+class PostgresSearch(Search):
+    """Backend for the GIN indexed tsvectors of PostgreSQL, with prefix queries."""
+
+    def filter(self, queryset: QuerySet, column: str, value: str) -> QuerySet:
+        """Filter Debts whose document column has words starting like value."""
+        # psycopg is only required with PostgreSQL
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        if not (terms := get_terms(value)):
+            return queryset
+        query = " & ".join(f"{term}:*" for term in terms)
+        query = SearchQuery(query, search_type="raw", config="simple")
+        # same expression as the index of the migration
+        vector = SearchVector(f"search__{column}", config="simple")
+        return queryset.annotate(
+            **{f"{column}_vector": vector, f"{column}_rank": SearchRank(vector, query)},
+        ).filter(**{f"{column}_vector": query})
+
+
+BACKENDS = {"sqlite": SQLiteSearch, "postgresql": PostgresSearch}
+
+
+def get_backend() -> Search:
+    """Get the search backend of the database."""
+    return BACKENDS.get(connection.vendor, Search)()
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "compotes.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -91,6 +92,27 @@ if DB == "postgres":  # pragma: no cover
         PASSWORD=os.environ["POSTGRES_PASSWORD"],
     )
 
+# Cache, shared by all workers if it is file-based
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "compotes_cache",
+    },
+}
+if CACHE_DIR := os.environ.get("CACHE_DIR"):  # pragma: no cover
+    CACHES["default"].update(
+        BACKEND="django.core.cache.backends.filebased.FileBasedCache",
+        LOCATION=CACHE_DIR,
+    )
+LEDGER_CACHE_TIMEOUT = int(os.environ.get("LEDGER_CACHE_TIMEOUT", "3600"))
+
+# Log requests above those thresholds as warnings, with their slowest queries
+
+INSTRUMENTATION_MAX_QUERIES = int(os.environ.get("INSTRUMENTATION_MAX_QUERIES", "50"))
+INSTRUMENTATION_MAX_SECONDS = float(os.environ.get("INSTRUMENTATION_MAX_SECONDS", "1"))
+INSTRUMENTATION_SLOWEST = int(os.environ.get("INSTRUMENTATION_SLOWEST", "3"))
+
 # Password validation
 
 _APV = "django.contrib.auth.password_validation"
@@ -127,6 +149,9 @@ STATIC_URL = "/static/"
 STATIC_ROOT = f"/srv/{PROJECT}/static/"
 LOGIN_REDIRECT_URL = "/"
 
+ACTIONS_ARCHIVE_DIR = os.environ.get("ACTIONS_ARCHIVE_DIR", f"/srv/{PROJECT}/archive/")
+ACTIONS_RETENTION_DAYS = int(os.environ.get("ACTIONS_RETENTION_DAYS", "365"))
+
 EMAIL_USE_SSL = True
 EMAIL_PORT = 465
 EMAIL_HOST = "mail.gandi.net"
@@ -0,0 +1,95 @@
+"""Compute a small set of transfers which settles all balances."""
+
+from collections.abc import Hashable
+from decimal import Decimal
+from heapq import heapify, heappop, heappush
+from typing import NamedTuple
+
+from django.db.models import QuerySet
+
+EXACT_LIMIT = 12
+
+
+class Transfer(NamedTuple):
+    """A payer gives cents to a payee."""
+
+    payer: Hashable
+    payee: Hashable
+    cents: int
+
+    @property
+    def value(self) -> Decimal:
+        """Get the amount of this Transfer, in euros."""
+        return Decimal(self.cents) / 100
+
+
+def greedy(balances: dict[Hashable, int]) -> list[Transfer]:
+    """Settle balances summing to zero, in at most n - 1 transfers."""
+    keys = list(balances)
+    creditors = [(-v, i) for i, v in enumerate(balances.values()) if v > 0]
+    debtors = [(v, i) for i, v in enumerate(balances.values()) if v < 0]
+    heapify(creditors)
+    heapify(debtors)
+    transfers = []
+    while creditors and debtors:
+        credit, payee = heappop(creditors)
+        debt, payer = heappop(debtors)
+        cents = min(-credit, -debt)
+        transfers.append(Transfer(keys[payer], keys[payee], cents))
+        if credit + cents:
+            heappush(creditors, (credit + cents, payee))
+        if debt + cents:
+            heappush(debtors, (debt + cents, payer))
+    return transfers
+
+
+def exact(balances: dict[Hashable, int]) -> list[Transfer]:
+    """Settle balances summing to zero, in the minimal number of transfers."""
+    keys = [key for key, value in balances.items() if value]
+    n = len(keys)
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    groups = [0] * (full + 1)  # maximal number of zero-sum groups in each subset
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + balances[keys[low.bit_length() - 1]]
+        groups[mask] = max(
+            groups[mask ^ (1 << i)] for i in range(n) if mask & (1 << i)
+        ) + (sums[mask] == 0)
+
+    # remove users one by one along an optimal path, and split it where sums are 0
+    transfers, group, mask = [], {}, full
+    while mask:
+        target = groups[mask] - (sums[mask] == 0)
+        i = next(
+            i for i in range(n) if mask & (1 << i) and groups[mask ^ (1 << i)] == target
+        )
+        group[keys[i]] = balances[keys[i]]
+        mask ^= 1 << i
+        if sums[mask] == 0:
+            transfers += greedy(group)
+            group = {}
+    return transfers
+
+
+def settle(balances: dict[Hashable, int], exact_limit=EXACT_LIMIT) -> list[Transfer]:
+    """Settle balances, exactly if there are at most exact_limit of them.
+
+    If balances do not sum to zero, because of roundings, the difference is left
+    to the users.
+    """
+    balances = {key: value for key, value in balances.items() if value}
+    if total := sum(balances.values()):
+        balances[None] = -total
+    algorithm = exact if len(balances) <= exact_limit else greedy
+    return [
+        transfer
+        for transfer in algorithm(balances)
+        if transfer.payer is not None and transfer.payee is not None
+    ]
+
+
+def settle_users(users: QuerySet, exact_limit=EXACT_LIMIT) -> list[Transfer]:
+    """Settle the balances of some users."""
+    users = users.exclude(balance=0)
+    return settle({user: int(user.balance * 100) for user in users}, exact_limit)
@@ -0,0 +1,126 @@
+"""Dump and load snapshots of the ledger, without the cascades of save()."""
+
+import json
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import groupby, islice
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Model
+
+from . import ledger
+from .models import (
+    BalanceHistory,
+    Debt,
+    DebtSearch,
+    Part,
+    Pool,
+    Share,
+    User,
+    recompute_balances,
+)
+
+CHUNK_SIZE = 1000
+MODELS: list[type[Model]] = [User, Debt, Part, Pool, Share, BalanceHistory]
+LABELS = {model._meta.label_lower: model for model in MODELS}
+
+
+class Encoder(DjangoJSONEncoder):
+    """Encode datetimes with their microseconds, which DjangoJSONEncoder drops."""
+
+    def default(self, o):
+        """Encode datetimes in full ISO format."""
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_fields(model: type[Model]) -> list[str]:
+    """Get the columns of a model."""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def to_line(data) -> str:
+    """Write a line of a snapshot."""
+    return json.dumps(data, cls=Encoder, separators=(",", ":")) + "\n"
+
+
+def dump(chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Get the lines of a snapshot of the ledger.
+
+    For each model, a header with its label and columns, then one JSON array per row.
+    """
+    for model in MODELS:
+        fields = get_fields(model)
+        yield to_line({"model": model._meta.label_lower, "fields": fields})
+        rows = model.objects.order_by("pk").values_list(*fields)
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield to_line(row)
+
+
+def read(lines: Iterable[str]) -> Iterator[Model]:
+    """Get the unsaved objects of a snapshot.
+
+    Raise a ValueError for invalid lines.
+    """
+    model, fields = None, []
+    for number, line in enumerate(lines, start=1):
+        data = json.loads(line)
+        if isinstance(data, dict):
+            if (model := LABELS.get(data.get("model"))) is None:
+                msg = f"Line {number}: unknown model {data.get('model')}"
+                raise ValueError(msg)
+            fields = data["fields"]
+        elif model is None:
+            msg = f"Line {number}: row without a model"
+            raise ValueError(msg)
+        else:
+            yield model(**dict(zip(fields, data, strict=True)))
+
+
+@contextmanager
+def keep_dates(model: type[Model]) -> Iterator[None]:
+    """Keep the dates of a model, instead of setting auto_now fields to now."""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for field in model._meta.concrete_fields
+        if isinstance(field, DateTimeField)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@transaction.atomic
+def load(lines: Iterable[str], chunk_size: int = CHUNK_SIZE) -> dict[str, int]:
+    """Load a snapshot into an empty ledger, and count the rows of each model.
+
+    Raise a ValueError if the ledger is not empty, or the snapshot is invalid.
+    """
+    if any(model.objects.exists() for model in MODELS):
+        msg = "The ledger is not empty"
+        raise ValueError(msg)
+    counts: dict[str, int] = defaultdict(int)
+    for model, objects in groupby(read(lines), key=type):
+        with keep_dates(model):
+            while chunk := list(islice(objects, chunk_size)):
+                model.objects.bulk_create(chunk)
+                counts[model._meta.label_lower] += len(chunk)
+
+    recompute_balances(User.objects.all())
+    debts = list(Debt.objects.values_list("pk", flat=True))
+    for start in range(0, len(debts), chunk_size):
+        DebtSearch.index(debts[start : start + chunk_size])
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+            cursor.execute(sql)
+    ledger.bump()
+    return dict(counts)
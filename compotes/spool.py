@@ -0,0 +1,122 @@
+"""Deliver the spooled mails."""
+
+import logging
+from collections import defaultdict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from smtplib import SMTPException
+from time import sleep
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+from dmdm import send_mail
+
+from .models import Mail
+
+logger = logging.getLogger(__name__)
+
+
+def send_host(mails: Sequence[Mail], delay: float = 0) -> list[str]:
+    """Send the mails of one host through one connection, and get their errors.
+
+    delay is the number of seconds to wait between two mails.
+    """
+    errors = []
+    try:
+        with get_connection() as connection:
+            for mail in mails:
+                if errors and delay:
+                    sleep(delay)
+                try:
+                    send_mail(
+                        mail.subject,
+                        mail.message,
+                        settings.DEFAULT_FROM_EMAIL,
+                        [mail.to],
+                        reply_to=[settings.ADMINS[0][1]],
+                        connection=connection,
+                    )
+                except (SMTPException, OSError) as e:
+                    errors.append(repr(e))
+                else:
+                    errors.append("")
+    except (SMTPException, OSError) as e:  # the connection itself failed
+        errors += [repr(e)] * (len(mails) - len(errors))
+    return errors
+
+
+def claim(lease: timedelta) -> list[Mail]:
+    """Get the pending mails, and postpone them by lease meanwhile.
+
+    Rows locked by another delivery are skipped, and those claimed here are not
+    pending for the others until the lease is over, when a crashed delivery retries.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        pending = Mail.objects.filter(sent=None, next_try__lte=now)
+        mails = list(pending.select_for_update(skip_locked=True).order_by("pk"))
+        Mail.objects.filter(pk__in=[mail.pk for mail in mails]).update(
+            next_try=now + lease,
+        )
+    return mails
+
+
+def save(
+    mails: Sequence[Mail],
+    errors: Sequence[str],
+    max_attempts: int,
+    backoff: timedelta,
+) -> int:
+    """Save the results of sending some mails, and count those which failed.
+
+    The n-th failure of a mail postpones it by backoff * 2 ** (n - 1), and it is
+    given up after max_attempts.
+    """
+    now = timezone.now()
+    for mail, error in zip(mails, errors, strict=True):
+        mail.attempts += 1
+        mail.error = error
+        if not error:
+            mail.sent = now
+        elif mail.attempts < max_attempts:
+            mail.next_try = now + backoff * 2 ** (mail.attempts - 1)
+        else:
+            mail.next_try = None
+            logger.error("Giving up %s: %s", mail, error)
+    Mail.objects.bulk_update(
+        mails,
+        ["attempts", "error", "sent", "next_try"],
+        batch_size=1000,
+    )
+    return sum(1 for error in errors if error)
+
+
+def deliver(
+    threads: int = 4,
+    delay: float = 0,
+    max_attempts: int = 5,
+    backoff: timedelta = timedelta(minutes=5),
+    lease: timedelta = timedelta(hours=1),
+) -> tuple[int, int]:
+    """Send the pending mails, and count those sent and those failed.
+
+    Mails are claimed for lease, and the results of each host are saved as soon as
+    it is done.
+    """
+    hosts = defaultdict(list)
+    for mail in claim(lease):
+        hosts[mail.host].append(mail)
+    sent = failed = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = {
+            pool.submit(send_host, mails, delay=delay): mails
+            for mails in hosts.values()
+        }
+        for future in as_completed(futures):
+            mails = futures[future]
+            errors = save(mails, future.result(), max_attempts, backoff)
+            sent, failed = sent + len(mails) - errors, failed + errors
+    return sent, failed
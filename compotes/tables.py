@@ -28,19 +28,10 @@ class UserTable(tables.Table):
 
 
 class DebtTable(tables.Table):
-    """List Debts."""
-
-    debitors = tables.Column(
-        accessor="get_debitors",
-        orderable=False,
-        verbose_name=_("Debitors"),
-    )
-    parts = tables.Column(
-        accessor="get_parts",
-        orderable=False,
-        verbose_name=_("Parts"),
-        attrs=NBR,
-    )
+    """List Debts, from a DebtQuerySet.with_parts()."""
+
+    debitors = tables.Column(verbose_name=_("Debitors"))
+    parts = tables.Column(verbose_name=_("Parts"), attrs=NBR)
     value = tables.Column(attrs=EUR)
     part_value = tables.Column(attrs=EUR)
     link = tables.Column(accessor="get_link", orderable=False, verbose_name=_("Link"))
@@ -1,27 +1,73 @@
 """Main test module."""
 
+import json
+from datetime import timedelta
 from decimal import Decimal
+from io import BytesIO, StringIO, TextIOWrapper
+from pathlib import Path
 from random import randint
+from smtplib import SMTPServerDisconnected
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
+from django.conf import settings
 from django.core import mail
-from django.core.management import call_command
-from django.db import models
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import CommandError, call_command
+from django.db import connection, models
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from ndh.utils import query_sum
 
+from actions import archive as actions_archive
 from actions.models import Action
 
-from .models import Debt, Part, Pool, Share, User
+from . import (
+    benchmark,
+    importer,
+    keyset,
+    ledger,
+    search,
+    settlement,
+    snapshot,
+    spool,
+)
+from .instrumentation import record
+from .models import Debt, DebtSearch, Mail, Part, Pool, Share, User
 
 
+class FlakyBackend(EmailBackend):
+    """Local SMTP stand-in, which fails for the "flaky.example.org" host."""
+
+    def send_messages(self, messages):
+        """Fail, or keep messages in django.core.mail.outbox."""
+        for message in messages:
+            if any(to.endswith("@flaky.example.org") for to in message.to):
+                raise SMTPServerDisconnected(message.to)
+        return super().send_messages(messages)
+
+
+DUMMY = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+
+
+@override_settings(CACHES={"default": DUMMY})
 class CompotesTests(TestCase):
-    """Main test class."""
+    """Main test class.
+
+    Pages are not cached, as the ledger version only changes on commit.
+    """
 
     def setUp(self):
         """Create a few guys and their interractions for all tests."""
-        for guy in "abcd":
-            User.objects.create_user(guy, email=f"{guy}@example.org", password=guy)
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for guy in "abcd":
+                User.objects.create_user(guy, email=f"{guy}@example.org", password=guy)
 
     def test_models_user(self):
         """Detail."""
@@ -136,6 +182,946 @@ class CompotesTests(TestCase):
         self.assertLess(total, Decimal("0.02"))
         self.assertGreater(total, Decimal("-0.02"))
 
+    def test_incremental_balances(self):
+        """Check balances maintained by deltas match a full recomputation."""
+        a, b, c, d = User.objects.all()
+        debt = Debt.objects.create(creditor=a, value=100)
+        for user in (a, b, c):
+            Part.objects.create(debt=debt, debitor=user, part=randint(1, 5))
+        part = Part.objects.create(debt=debt, debitor=d, part=2)
+        part.debitor = b
+        part.save()
+        debt.creditor = c
+        debt.value = 42
+        debt.save()
+        Part.objects.filter(debitor=a).first().delete()
+        pool = Pool.objects.create(name="p", organiser=d, value=60)
+        for user in (a, b, c):
+            Share.objects.create(pool=pool, participant=user, maxi=randint(20, 40))
+        Share.objects.get(participant=a).delete()
+        for user in User.objects.all():
+            self.assertEqual(user.balance, user.get_balance())
+
+        # Balances are only rounded to cents once, in both computations
+        before = User.objects.get(pk=b.pk).balance
+        for _ in range(3):
+            thirds = Debt.objects.create(creditor=d, value=10)
+            thirds.add_parts([Part(debitor=user) for user in (a, b, c)])
+        self.assertEqual(User.objects.get(pk=b.pk).balance - before, Decimal("-10.00"))
+        for user in User.objects.all():
+            self.assertEqual(user.balance, user.get_balance())
+
+        # The cost of a write must not depend on the users history
+        def part_queries():
+            debt = Debt.objects.create(creditor=a, value=10)
+            with CaptureQueriesContext(connection) as queries:
+                Part.objects.create(debt=debt, debitor=b, part=1)
+            return len(queries)
+
+        first = part_queries()
+        for _ in range(5):
+            part_queries()
+        self.assertEqual(part_queries(), first)
+
+    def test_bulk_parts(self):
+        """Add many parts at once, with a single Debt update."""
+        a, b, c, d = User.objects.all()
+        debt = Debt.objects.create(creditor=a, value=90, name="bulk")
+        parts = debt.add_parts(Part(debitor=user, part=1) for user in (a, b, c))
+        self.assertEqual(debt.part_value, 30)
+        self.assertEqual([part.value for part in parts], [30, 30, 30])
+        self.assertEqual(User.objects.get(pk=a.pk).balance, 60)
+        self.assertEqual(User.objects.get(pk=c.pk).balance, -30)
+
+        # Through the view, with a query count which does not depend on the parts
+        self.client.login(username="a", password="a")
+        url = reverse("parts_create", kwargs={"pk": debt.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.post(url, {"debitors": [d.pk], "part": 2})
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(r.url, debt.get_absolute_url())
+        with CaptureQueriesContext(connection) as more_queries:
+            self.client.post(url, {"debitors": [a.pk, b.pk, c.pk, d.pk], "part": 1})
+        self.assertEqual(len(queries), len(more_queries))
+        self.assertEqual(Part.objects.filter(debt=debt).count(), 8)
+        self.assertEqual(Action.objects.count(), 5)
+        self.assertEqual(Debt.objects.get(pk=debt.pk).part_value, 10)
+        for user in User.objects.all():
+            self.assertEqual(user.balance, user.get_balance())
+
+    def test_ledger_deferred(self):
+        """Coalesce recomputations at the end of a ledger.deferred() block."""
+        a, b, c, d = User.objects.all()
+        with ledger.deferred() as dirty:
+            debt = Debt.objects.create(creditor=a, value=60)
+            for user in (a, b, c):
+                Part.objects.create(debt=debt, debitor=user, part=1)
+            pool = Pool.objects.create(name="p", organiser=d, value=20)
+            for user in (a, b):
+                Share.objects.create(pool=pool, participant=user, maxi=20)
+            self.assertEqual(dirty.debts, {debt.pk})
+            self.assertEqual(dirty.pools, {pool.pk})
+            self.assertEqual(User.objects.get(pk=a.pk).balance, 0)
+        self.assertEqual(Debt.objects.get(pk=debt.pk).part_value, 20)
+        self.assertEqual(Share.objects.get(participant=a).value, 10)
+        self.assertEqual(User.objects.get(pk=a.pk).balance, 30)
+        self.assertEqual(User.objects.get(pk=d.pk).balance, 20)
+
+        # the old creditor is recomputed too, and so is the deleted debitor
+        with ledger.deferred():
+            debt.creditor = d
+            debt.save()
+            Part.objects.get(debitor=c).delete()
+        for user in User.objects.all():
+            self.assertEqual(user.balance, user.get_balance())
+        self.assertEqual(User.objects.get(pk=c.pk).balance, 0)
+
+        # through the admin
+        User.objects.filter(pk=a.pk).update(is_staff=True, is_superuser=True)
+        self.client.login(username="a", password="a")
+        url = reverse("admin:compotes_part_change", args=[Part.objects.first().pk])
+        part = {"debt": debt.pk, "debitor": a.pk, "part": 2, "value": 0}
+        r = self.client.post(url, part)
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(Debt.objects.get(pk=debt.pk).part_value, 20)
+        self.assertEqual(User.objects.get(pk=a.pk).balance, -40 - 10)
+
+    def test_recompute_balances(self):
+        """Run the "recompute_balances" management command."""
+        a, b, c, d = User.objects.all()
+        debt = Debt.objects.create(creditor=a, value=30)
+        debt.add_parts(Part(debitor=user, part=1) for user in (b, c, d))
+        User.objects.filter(pk__in=[a.pk, b.pk]).update(balance=12)
+
+        out = StringIO()
+        call_command("recompute_balances", "--dry-run", stdout=out)
+        self.assertIn("a: 12.00 → 30.00 €", out.getvalue())
+        self.assertIn("b: 12.00 → -10.00 €", out.getvalue())
+        self.assertIn("2 wrong balance(s) to fix", out.getvalue())
+        self.assertEqual(User.objects.get(pk=a.pk).balance, 12)
+
+        call_command("recompute_balances", "--users", "b", "c", stdout=out)
+        self.assertEqual(User.objects.get(pk=a.pk).balance, 12)
+        self.assertEqual(User.objects.get(pk=b.pk).balance, -10)
+
+        # from the admin
+        User.objects.filter(pk=a.pk).update(is_staff=True, is_superuser=True)
+        self.client.login(username="a", password="a")
+        r = self.client.get("/admin/compotes/user/update-balance")
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(User.objects.get(pk=a.pk).balance, 30)
+
+    def test_debt_list_queries(self):
+        """Check the debt list needs a constant number of queries."""
+        a, b, c, d = User.objects.all()
+        self.client.login(username="a", password="a")
+
+        def debt_list_queries(n_debts):
+            for i in range(n_debts):
+                debt = Debt.objects.create(creditor=a, value=10 + i, name=f"d{i}")
+                debt.add_parts(Part(debitor=user, part=i % 3) for user in (b, c, d))
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(reverse("debt_list"), data={"sort": "-parts"})
+            return r, len(queries)
+
+        _, first = debt_list_queries(2)
+        r, queries = debt_list_queries(10)
+        self.assertEqual(queries, first)
+        debts = [row.record for row in r.context["table"].paginated_rows]
+        self.assertEqual([debt.parts for debt in debts][:2], [6, 6])
+        self.assertEqual(debts[0].debitors, 3)
+
+    def test_list_pages(self):
+        """Paginate debts and pools by keyset in their default ordering."""
+        a, b, *_ = User.objects.all()
+        now = timezone.now()
+        Debt.objects.bulk_create(
+            Debt(creditor=a, value=1, name=f"d{i}", date=now - timedelta(days=i % 7))
+            for i in range(60)
+        )
+        self.client.login(username="a", password="a")
+        url = reverse("debt_list")
+
+        def names(r):
+            return [row.record.name for row in r.context["table"].paginated_rows]
+
+        def debt_list(**data):
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(url, data)
+            return r, len(queries)
+
+        seen, after = [], None
+        for _ in range(3):
+            r, queries = debt_list(**({"after": after} if after else {}))
+            seen += names(r)
+            after = QueryDict(r.context["keyset_next"]).get("after")
+        self.assertEqual(len(seen), 60)
+        self.assertEqual(len(set(seen)), 60)
+        self.assertEqual(
+            seen,
+            [debt.name for debt in Debt.objects.order_by("-date", "-pk")],
+        )
+        self.assertIsNone(r.context["keyset_next"])
+        self.assertEqual(r.context["keyset_first"], "")
+        self.assertEqual(r.context["keyset_count"], 60)
+        self.assertFalse(hasattr(r.context["table"], "page"))
+        self.assertContains(r, "about 60 rows")
+        _, first = debt_list()
+        self.assertEqual(queries, first)
+
+        # Other orderings are paginated by offset, without counting
+        r, _ = debt_list(sort="value", page=2)
+        self.assertEqual(len(names(r)), 25)
+        self.assertNotIn("keyset_next", r.context)
+        r, _ = debt_list(user="a")
+        self.assertNotIn("keyset_next", r.context)
+        self.assertIsNone(keyset.estimate(Debt.objects.filter(creditor=b)))
+
+        Pool.objects.bulk_create(
+            Pool(name=f"p{i}", slug=f"p{i}", organiser=b, value=1) for i in range(30)
+        )
+        Share.objects.create(pool=Pool.objects.get(name="p0"), participant=a, maxi=1)
+        r = self.client.get(reverse("pool_list"))
+        self.assertEqual(names(r), ["p0"])
+        self.client.login(username="b", password="b")
+        r = self.client.get(reverse("pool_list"))
+        self.assertEqual(len(names(r)), 25)
+        after = QueryDict(r.context["keyset_next"])["after"]
+        r = self.client.get(reverse("pool_list"), {"after": after})
+        self.assertEqual(len(names(r)), 5)
+        r = self.client.get(reverse("pool_list"), {"after": keyset.encode(["x", 1])})
+        self.assertEqual(len(names(r)), 25)
+
+    def test_debt_search(self):
+        """Search debts by users, name and description, ranked by relevance."""
+        a, b, c, d = User.objects.all()
+        c.first_name, c.last_name = "Éloïse", "Martin"
+        c.save()
+        pizza = Debt.objects.create(creditor=a, value=30, name="Pizza")
+        pizza.add_parts([Part(debitor=b), Part(debitor=c)])
+        party = Debt.objects.create(
+            creditor=d,
+            value=10,
+            name="Party",
+            description="pizza pizza pizza",
+        )
+        Part.objects.create(debt=party, debitor=a)
+        self.client.login(username="a", password="a")
+
+        def find(**data):
+            r = self.client.get(reverse("debt_list"), data=data)
+            return [row.record.name for row in r.context["table"].paginated_rows]
+
+        self.assertEqual(find(user="elo"), ["Pizza"])
+        self.assertEqual(find(user="mart elo"), ["Pizza"])
+        self.assertEqual(find(user="a"), ["Party", "Pizza"])
+        self.assertEqual(find(user="a", debt="pizz"), ["Party", "Pizza"])
+        self.assertEqual(find(user="b", debt="pizz"), ["Pizza"])
+        self.assertEqual(find(debt="zzz"), [])
+        self.assertEqual(find(debt="*\"'"), ["Party", "Pizza"])
+        for sort in ("rank", "-rank"):
+            self.assertEqual(find(sort=sort), ["Party", "Pizza"])
+
+        # Documents follow renames, and only them
+        with record() as queries:
+            c.save()
+        self.assertFalse(
+            any("compotes_debtsearch" in sql for _, sql in queries.queries)
+        )
+        c.first_name = "Lucie"
+        c.save()
+        self.assertEqual(find(user="elo"), [])
+        pizza.name = "Pasta"
+        pizza.save()
+        self.assertEqual(find(user="lucie", debt="pasta"), ["Pasta"])
+
+        # Fallback backend, without index
+        with patch.dict(search.BACKENDS, clear=True):
+            self.assertEqual(find(user="mart luc"), ["Pasta"])
+            self.assertEqual(find(user="a", debt="pizz"), ["Party"])
+
+    def test_user_search(self):
+        """Suggest users by prefixes of their names, for the debt filter."""
+        *_, c, d = User.objects.all()
+        c.first_name, c.last_name = "Joe", "Dohn"
+        c.save()
+        d.last_name = "Johnson"
+        d.save()
+        url = reverse("user_search")
+        self.assertEqual(self.client.get(url, {"q": "jo"}).status_code, 302)
+        self.client.login(username="a", password="a")
+
+        r = self.client.get(url, {"q": "JO"})
+        self.assertEqual(r["Cache-Control"], "private, max-age=300")
+        self.assertEqual(
+            r.json()["users"],
+            [
+                {"value": "c", "label": "Joe Dohn (c)"},
+                {"value": "d", "label": "Johnson (d)"},
+            ],
+        )
+        self.assertEqual(len(self.client.get(url, {"q": "do"}).json()["users"]), 1)
+        self.assertEqual(self.client.get(url, {"q": " "}).json()["users"], [])
+
+        r = self.client.get(reverse("debt_list"))
+        self.assertContains(r, f'data-autocomplete="{url}"')
+        self.assertNotContains(r, "Joe Dohn")
+
+    @override_settings(CACHES=settings.CACHES)
+    def test_ledger_cache(self):
+        """Cache pages per user, until the ledger changes."""
+        a, b, *_ = User.objects.all()
+        self.client.login(username="a", password="a")
+        url = reverse("debt_list")
+
+        def get():
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(url)
+            return r, len(queries)
+
+        get()  # set the CSRF cookie
+        r, rendered = get()
+        self.assertNotContains(r, "Gifts")
+        r, cached = get()
+        self.assertLess(cached, rendered)
+        self.assertNotContains(r, "Gifts")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            debt = Debt.objects.create(creditor=a, value=10, name="Gifts")
+        r, queries = get()
+        self.assertGreater(queries, cached)
+        self.assertContains(r, "Gifts")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Part.objects.create(debt=debt, debitor=b)
+        self.assertEqual(len(callbacks), 1)
+        self.assertGreater(get()[1], cached)
+        self.assertEqual(get()[1], cached)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("recompute_balances", stdout=StringIO())
+        self.assertEqual(get()[1], cached)
+        User.objects.filter(pk=b.pk).update(balance=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("recompute_balances", stdout=StringIO())
+        self.assertGreater(get()[1], cached)
+
+        self.client.login(username="b", password="b")
+        self.assertGreater(get()[1], cached)
+
+    @override_settings(CACHES=settings.CACHES)
+    def test_conditional_get(self):
+        """Answer 304 to clients which are up to date."""
+        a, b, *_ = User.objects.all()
+        with self.captureOnCommitCallbacks(execute=True):
+            debt = Debt.objects.create(creditor=a, value=10, name="Gifts")
+        self.client.login(username="a", password="a")
+        url = reverse("debt_detail", kwargs={"pk": debt.pk})
+
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        etag, last_modified = r["ETag"], r["Last-Modified"]
+        self.assertEqual(r["Cache-Control"], "private, no-cache")
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(r.status_code, 304)
+        self.assertFalse(any("compotes_part" in q["sql"] for q in queries))
+        r = self.client.get(url, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(r.status_code, 304)
+
+        # A new Part changes the debt
+        with self.captureOnCommitCallbacks(execute=True):
+            Part.objects.create(debt=debt, debitor=b)
+        r = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        etag = r["ETag"]
+        for name in ("debt_list", "home"):
+            r = self.client.get(reverse(name))
+            self.assertEqual(r.status_code, 200)
+            r = self.client.get(reverse(name), headers={"If-None-Match": r["ETag"]})
+            self.assertEqual(r.status_code, 304)
+
+        # and users, shown in the tables
+        home = r["ETag"]
+        b.first_name = "Bob"
+        with self.captureOnCommitCallbacks(execute=True):
+            b.save()
+        r = self.client.get(reverse("home"), headers={"If-None-Match": home})
+        self.assertEqual(r.status_code, 200)
+
+        # Validators depend on the user
+        self.client.login(username="b", password="b")
+        r = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse("debt_detail", args=[0])).status_code, 404
+        )
+
+    def test_balance_history(self):
+        """Get balances at some dates, from their history."""
+        a, b, c, _d = User.objects.all()
+        start = timezone.now()
+        debt = Debt.objects.create(creditor=a, value=10, name="Gifts")
+        Part.objects.create(debt=debt, debitor=b)
+        middle = timezone.now()
+        with ledger.deferred():
+            Part.objects.create(debt=debt, debitor=c)
+        end = timezone.now()
+
+        self.assertEqual(a.balance_at(start), 0)
+        self.assertEqual(a.balance_at(middle), 10)
+        self.assertEqual(b.balance_at(middle), -10)
+        self.assertEqual(b.balance_at(end), -5)
+        self.assertEqual(
+            [balance for _, balance in b.balance_history(start, end)],
+            [0, -10, -5],
+        )
+        self.assertEqual(
+            [balance for _, balance in b.balance_history(middle, end)],
+            [-10, -5],
+        )
+
+        # Fixed balances are recorded too
+        User.objects.filter(pk=c.pk).update(balance=0)
+        call_command("recompute_balances", stdout=StringIO())
+        self.assertEqual(c.balancehistory_set.latest("pk").balance, -5)
+        out = StringIO()
+        call_command("balance_checkpoint", stdout=out)
+        self.assertEqual(out.getvalue(), "4 checkpoint(s) added\n")
+        self.assertEqual(b.balancehistory_set.latest("pk").checkpoint, True)
+
+        self.client.login(username="a", password="a")
+        r = self.client.get(
+            reverse("user_detail", kwargs={"slug": "b"}),
+            {"at": f"{timezone.localtime(middle):%Y-%m-%d %H:%M:%S.%f}"},
+        )
+        self.assertEqual(r.context["balance_at"][1], -10)
+        self.assertEqual(len(r.context["balances"]), 3)
+        r = self.client.get(
+            reverse("user_balances", kwargs={"slug": "b"}),
+            {"start": f"{timezone.localtime(start):%Y-%m-%d %H:%M:%S.%f}"},
+        )
+        self.assertEqual(
+            [balance for _, balance in r.json()["balances"]],
+            ["0.00", "-10.00", "-5.00", "-5.00"],
+        )
+
+    def test_settlement(self):
+        """Settle balances in a minimal number of transfers."""
+        balances = {"a": -9, "b": -7, "c": -8, "d": 9, "e": -9, "f": 24}
+        self.assertEqual(len(settlement.greedy(balances)), 5)
+        transfers = settlement.exact(balances)
+        self.assertEqual(len(transfers), 4)
+        for payer, payee, cents in transfers:
+            balances[payer] += cents
+            balances[payee] -= cents
+        self.assertEqual(set(balances.values()), {0})
+        self.assertEqual(
+            settlement.settle({"a": 100, "b": -99}, exact_limit=0),
+            [settlement.Transfer("b", "a", 99)],
+        )
+
+        a, b, c, d = User.objects.all()
+        debt = Debt.objects.create(creditor=a, value=30, name="Gifts")
+        debt.add_parts([Part(debitor=b), Part(debitor=c), Part(debitor=d)])
+        out = StringIO()
+        call_command("settle", stdout=out)
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            [
+                *(f"{user}: 10.00 €" for user in ("b → a", "c → a", "d → a")),
+                "3 transfer(s)",
+            ],
+        )
+        self.client.login(username="a", password="a")
+        r = self.client.get(reverse("settlement"))
+        self.assertEqual(len(r.context["transfers"]), 3)
+        self.assertContains(r, "table-primary", count=3)
+
+    def test_debts_bulk(self):
+        """Create a batch of debts with their parts, in one request."""
+        self.client.login(username="a", password="a")
+        url = reverse("debts_bulk")
+
+        def post(data):
+            return self.client.post(url, data, content_type="application/json")
+
+        batch = {
+            "debts": [
+                {
+                    "name": "Pizza",
+                    "creditor": "a",
+                    "value": "30",
+                    "date": "2022-08-29 23:33",
+                    "parts": [{"debitor": "b"}, {"debitor": "c", "part": 2}],
+                },
+                {"name": "Gift", "creditor": "d", "value": 8, "parts": []},
+                {"name": "Bad", "creditor": "z", "value": "x", "parts": [{}]},
+                {
+                    "name": "Worse",
+                    "creditor": ["a"],
+                    "value": 1,
+                    "parts": [{"debitor": {"x": 1}}],
+                },
+            ],
+        }
+        r = post(batch)
+        self.assertEqual(r.status_code, 400)
+        results = r.json()["results"]
+        self.assertEqual(results[0], {"errors": {}, "parts": [{"errors": {}}] * 2})
+        self.assertEqual(set(results[2]["errors"]), {"creditor", "value"})
+        self.assertEqual(set(results[2]["parts"][0]["errors"]), {"debitor"})
+        self.assertEqual(set(results[3]["errors"]), {"creditor"})
+        self.assertEqual(set(results[3]["parts"][0]["errors"]), {"debitor"})
+        self.assertFalse(Debt.objects.exists())
+        self.assertEqual(post({"debts": "nope"}).status_code, 400)
+        self.assertEqual(post([]).status_code, 400)
+        self.assertEqual(
+            self.client.post(url, "{", "application/json").status_code, 400
+        )
+
+        del batch["debts"][2:]
+        r = post(batch)
+        self.assertEqual(r.status_code, 201)
+        pizza, gift = r.json()["results"]
+        self.assertEqual(pizza["url"], f"/debt/{pizza['pk']}")
+        self.assertEqual(len(pizza["parts"]), 2)
+        self.assertEqual(gift["parts"], [])
+        self.assertEqual(Debt.objects.get(pk=pizza["pk"]).part_value, 10)
+        self.assertEqual(Part.objects.get(pk=pizza["parts"][1]).value, 20)
+        balances = dict(User.objects.values_list("username", "balance"))
+        self.assertEqual(balances, {"a": 30, "b": -10, "c": -20, "d": 0})
+        self.assertEqual(Action.objects.count(), 4)
+        self.assertEqual(
+            Debt.objects.filter(search__users__contains="b").get().name,
+            "Pizza",
+        )
+
+        # The cost of a batch does not depend on the number of its debts and parts
+        def batch_queries(n):
+            with CaptureQueriesContext(connection) as queries:
+                post({"debts": batch["debts"] * n})
+            return len(queries)
+
+        self.assertEqual(batch_queries(5), batch_queries(1))
+
+    def test_parts_update(self):
+        """Edit, add and delete all the parts of a debt in one submission."""
+        a, b, c, d = User.objects.all()
+        debt = Debt.objects.create(creditor=a, value=60, name="Gifts")
+        bp, cp = debt.add_parts([Part(debitor=b), Part(debitor=c)])
+        self.client.login(username="a", password="a")
+        url = reverse("parts_update", kwargs={"pk": debt.pk})
+        r = self.client.get(url)
+        self.assertEqual(len(r.context["form"]), 5)
+        self.assertContains(self.client.get(debt.get_absolute_url()), url)
+
+        def part(i, pk="", debitor="", part="", delete=False):
+            data = {"id": pk, "debt": debt.pk, "debitor": debitor, "part": part}
+            if delete:
+                data["DELETE"] = "on"
+            return {f"part_set-{i}-{key}": value for key, value in data.items()}
+
+        data = {
+            "part_set-TOTAL_FORMS": 4,
+            "part_set-INITIAL_FORMS": 2,
+            **part(0, bp.pk, b.pk, 1),
+            **part(1, cp.pk, c.pk, 1, delete=True),
+            **part(2, debitor=c.pk, part=2),
+            **part(3, debitor=d.pk, part=3),
+        }
+        actions = Action.objects.count()
+        with record() as queries:
+            r = self.client.post(url, data)
+        self.assertRedirects(r, debt.get_absolute_url())
+        # with a single recomputation
+        self.assertEqual(
+            sum("UPDATE" in sql and "balance" in sql for _, sql in queries.queries),
+            1,
+        )
+        self.assertEqual(
+            sorted(Part.objects.values_list("debitor__username", "value")),
+            [("b", 10), ("c", 20), ("d", 30)],
+        )
+        balances = dict(User.objects.values_list("username", "balance"))
+        self.assertEqual(balances, {"a": 60, "b": -10, "c": -20, "d": -30})
+        self.assertEqual(Action.objects.count(), actions + 1)
+        action = Action.objects.last()
+        self.assertEqual((action.act, action.object_id), ("U", debt.pk))
+        self.assertEqual(
+            {act: len(parts) for act, parts in action.json["parts"].items()},
+            {"created": 2, "deleted": 1},
+        )
+        self.assertEqual(action.json["parts"]["deleted"][0]["pk"], cp.pk)
+        r = self.client.get(debt.get_absolute_url())
+        self.assertContains(r, "Parts created: 2")
+
+        # Unchanged formsets change nothing
+        parts = Part.objects.order_by("pk").values_list("pk", "debitor", "part")
+        unchanged = {"part_set-TOTAL_FORMS": 3, "part_set-INITIAL_FORMS": 3}
+        for i, (pk, debitor, n) in enumerate(parts):
+            unchanged |= part(i, pk, debitor, n)
+        self.assertRedirects(self.client.post(url, unchanged), debt.get_absolute_url())
+        self.assertEqual(Action.objects.count(), actions + 1)
+
+    def test_import_debts(self):
+        """Import the valid rows of a CSV file, and report the others."""
+        rows = [
+            "date,name,creditor,value,debitors,description",
+            "2024-01-15,pizza,a,30,b c:2,friday",
+            "2024-01-16,ghost,z,10,b,",
+            "2024-01-17,nobody,a,10,,",
+            "2024-01-18,beer,b,abc,a x,",
+            "2024-01-19,wine,b,12,a d,",
+        ]
+        actions = Action.objects.count()
+        err = StringIO()
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / "debts.csv"
+            path.write_text("\n".join(rows))
+            with record() as queries:
+                call_command(
+                    "import_debts",
+                    str(path),
+                    "--user=a",
+                    "--chunk-size=2",
+                    stdout=StringIO(),
+                    stderr=err,
+                )
+            with self.assertRaises(CommandError):
+                call_command("import_debts", str(path), "--user=z")
+
+        self.assertEqual(
+            sorted(Debt.objects.values_list("name", "value")),
+            [("pizza", 30), ("wine", 12)],
+        )
+        self.assertEqual(Action.objects.count(), actions + 6)
+        balances = dict(User.objects.values_list("username", "balance"))
+        self.assertEqual(balances, {"a": 24, "b": 2, "c": -20, "d": -6})
+        errors = err.getvalue().splitlines()
+        self.assertEqual(
+            [error.split(":")[0] for error in errors],
+            ["line 3", "line 4", "line 5", "line 5"],
+        )
+        self.assertIn("debitors: x: Unknown user", errors[-1])
+        # one username lookup per chunk, and one recomputation per chunk with debts
+        lookups = [sql for _, sql in queries.queries if '"username" IN' in sql]
+        self.assertEqual(len(lookups), 3)
+        self.assertEqual(
+            sum("UPDATE" in sql and "balance" in sql for _, sql in queries.queries),
+            2,
+        )
+
+        self.client.login(username="a", password="a")
+        url = reverse("debts_import")
+        content = "\n".join([rows[0], "2024-02-01,tea,c,4,a b,"]).encode()
+        r = self.client.post(url, {"file": SimpleUploadedFile("a.csv", content)})
+        self.assertContains(r, "1 debt imported.")
+        r = self.client.post(url, {"file": SimpleUploadedFile("a.csv", b"date,name")})
+        self.assertContains(r, "Missing columns: creditor, value, debitors")
+        self.assertEqual(Debt.objects.count(), 3)
+
+        # A decoding error midway keeps the recomputed chunks before it
+        content = "\n".join([rows[0], *["2024-03-01,tea,c,4,a b,"] * 500]).encode()
+        lines = TextIOWrapper(BytesIO(content + b"\n2024-03-02,t\xe9,c,4,a,"))
+        report = importer.import_debts(lines, User.objects.get(username="a"))
+        self.assertIn(len(report.debts), range(100, 500))
+        self.assertEqual(report.errors[0][0], len(report.debts) + 2)
+        self.assertFalse(Debt.objects.filter(part_value=0).exists())
+        self.assertFalse(Debt.objects.filter(search__isnull=True).exists())
+        for user in User.objects.all():
+            self.assertEqual(user.balance, user.get_balance())
+
+    def test_export(self):
+        """Stream filtered rows as CSV or JSON Lines."""
+        a, b, c, _d = User.objects.all()
+        old = Debt.objects.create(
+            creditor=a, value=10, name="old", date="2022-01-01T00:00+01:00"
+        )
+        old.add_parts([Part(debitor=b)])
+        gift = Debt.objects.create(creditor=a, value=30, name="gift")
+        gift.add_parts([Part(debitor=b), Part(debitor=c)])
+        self.client.login(username="a", password="a")
+
+        url = reverse("export", kwargs={"name": "debts", "fmt": "csv"})
+        r = self.client.get(url)
+        self.assertTrue(r.streaming)
+        self.assertEqual(r["Content-Type"], "text/csv")
+        lines = b"".join(r.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:4], ["id", "created", "updated", "name"])
+        self.assertEqual(len(lines), 3)
+        r = self.client.get(url, {"since": "2022-06-01"})
+        self.assertEqual(len(b"".join(r.streaming_content).splitlines()), 2)
+        self.assertEqual(self.client.get(url, {"since": "never"}).status_code, 400)
+        url = reverse("export", kwargs={"name": "debts", "fmt": "xml"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        url = reverse("export", kwargs={"name": "parts", "fmt": "jsonl"})
+        r = self.client.get(url, {"debt": "gift"})
+        parts = [json.loads(line) for line in r.streaming_content]
+        self.assertEqual([part["debitor_id"] for part in parts], [b.pk, c.pk])
+
+        out = StringIO()
+        call_command("export", "actions", "--format=jsonl", stdout=out)
+        self.assertEqual(out.getvalue().count("\n"), Action.objects.count())
+        with TemporaryDirectory() as tmp:
+            output = Path(tmp) / "parts.csv"
+            call_command(
+                "export",
+                "parts",
+                "--filter=user=c",
+                "--until=2030-01-01",
+                "--chunk-size=1",
+                f"--output={output}",
+            )
+            self.assertEqual(len(output.read_text().splitlines()), 3)
+        with self.assertRaises(CommandError):
+            call_command("export", "pools", "--since=never")
+
+    def test_ledger_snapshot(self):
+        """Dump the ledger, and load it back into an empty ledger."""
+        a, b, c, _d = User.objects.all()
+        debt = Debt.objects.create(creditor=a, value=30, name="gift")
+        debt.add_parts([Part(debitor=b), Part(debitor=c, part=2)])
+        pool = Pool.objects.create(organiser=b, value=10, name="pool")
+        Share.objects.create(pool=pool, participant=c, maxi=20)
+        Share.objects.create(pool=pool, participant=a, maxi=5)
+        rows = {
+            model: list(model.objects.order_by("pk").values_list())
+            for model in snapshot.MODELS
+        }
+
+        with TemporaryDirectory() as tmp:
+            output = Path(tmp) / "ledger.jsonl.gz"
+            call_command("ledger_dump", f"--output={output}", "--chunk-size=2")
+            with self.assertRaises(CommandError):
+                call_command("ledger_load", str(output), stdout=StringIO())
+            Action.objects.all().delete()
+            for model in reversed(snapshot.MODELS):
+                model.objects.all().delete()
+            out = StringIO()
+            with record() as queries:
+                call_command("ledger_load", str(output), "--chunk-size=2", stdout=out)
+            # 4 users, in chunks of 2
+            inserts = [sql for _, sql in queries.queries if "INSERT" in sql]
+            self.assertEqual(sum('"compotes_user"' in sql for sql in inserts), 2)
+
+        self.assertIn("compotes.part: 2 row(s) loaded", out.getvalue())
+        for model, values in rows.items():
+            self.assertEqual(list(model.objects.order_by("pk").values_list()), values)
+        self.assertEqual(DebtSearch.objects.get(debt=debt).users, "a   b   c  ")
+        self.assertGreater(Debt.objects.create(creditor=a, value=1).pk, debt.pk)
+
+        with self.assertRaises(ValueError):
+            list(snapshot.read(['[1, "a"]\n']))
+
+    def test_benchmark(self):
+        """Benchmark small synthetic ledgers, and leave the database untouched."""
+        users = User.objects.count()
+        with TemporaryDirectory() as tmp:
+            output = Path(tmp) / "benchmark.json"
+            call_command(
+                "benchmark",
+                "--sizes",
+                "10",
+                "20",
+                "--repeat=1",
+                "--parts=5",
+                "--label=test",
+                f"--output={output}",
+                stdout=StringIO(),
+            )
+            results = json.loads(output.read_text())
+        self.assertEqual(results["label"], "test")
+        self.assertEqual(len(results["results"]), 20)
+        self.assertEqual(
+            {result["scenario"] for result in results["results"]},
+            {
+                "Debt.save",
+                "Part.save",
+                "Pool.save",
+                "User.save",
+                *(
+                    f"{model}{kind}View"
+                    for model in ("User", "Debt", "Pool")
+                    for kind in ("List", "Detail")
+                ),
+            },
+        )
+        self.assertTrue(all(result["queries"] for result in results["results"]))
+        self.assertEqual(User.objects.count(), users)
+        self.assertFalse(Debt.objects.exists())
+
+    def assertQueryBudget(self, budget: int, url: str, **kwargs):  # noqa: N802
+        """Check a page renders in at most budget SQL queries, without cache."""
+        with override_settings(CACHES={"default": DUMMY}), record() as queries:
+            r = self.client.get(url, **kwargs)
+        self.assertEqual(r.status_code, 200)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            "\n".join(
+                [f"{url}: {len(queries)} queries", *(q for _, q in queries.queries)]
+            ),
+        )
+
+    def test_query_budgets(self):
+        """Keep the number of queries of the main pages bounded."""
+        ledger = benchmark.generate(50, parts=10, shares=10)
+        self.client.force_login(ledger.users[0])
+        for debt in ledger.debts[:3]:
+            self.assertQueryBudget(11, debt.get_absolute_url())
+        for pool in ledger.pools[:3]:
+            self.assertQueryBudget(13, pool.get_absolute_url())
+        for user in ledger.users[:3]:
+            self.assertQueryBudget(11, user.get_absolute_url())
+        self.assertQueryBudget(5, reverse("debt_list"))
+        self.assertQueryBudget(5, reverse("debt_list"), data={"name": "debt"})
+
+    def test_instrumentation(self):
+        """Log slow requests with their slowest queries."""
+        self.client.login(username="a", password="a")
+        with self.assertLogs("compotes.instrumentation", "DEBUG") as logs:
+            r = self.client.get(reverse("debt_list"))
+        self.assertIn("sql;dur=", r["Server-Timing"])
+        self.assertEqual(logs.records[0].levelname, "DEBUG")
+        with (
+            override_settings(INSTRUMENTATION_MAX_QUERIES=0, INSTRUMENTATION_SLOWEST=2),
+            self.assertLogs("compotes.instrumentation", "WARNING") as logs,
+        ):
+            self.client.get(reverse("debt_list"), {"name": "x"})
+        data = logs.records[0].instrumentation
+        self.assertEqual(data["view"], "debt_list")
+        self.assertEqual(data["status"], 200)
+        self.assertGreater(data["render_seconds"], 0)
+        self.assertEqual(len(data["slowest"]), 2)
+        self.assertGreaterEqual(
+            data["slowest"][0]["seconds"],
+            data["slowest"][1]["seconds"],
+        )
+
+    def test_user_detail_pages(self):
+        """Check the user detail sections are paginated by keyset."""
+        a, b, *_ = User.objects.all()
+        self.client.login(username="a", password="a")
+
+        def user_detail_queries(n_debts):
+            for i in range(n_debts):
+                debt = Debt.objects.create(creditor=a, value=1, name=f"debt {i}")
+                debt.add_parts([Part(debitor=a, part=1), Part(debitor=b, part=1)])
+            url = reverse("user_detail", kwargs={"slug": "a"})
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(url)
+            return r, len(queries)
+
+        _, first = user_detail_queries(1)
+        r, queries = user_detail_queries(29)
+        self.assertEqual(queries, first)
+        self.assertEqual(len(r.context["credit_page"]), 25)
+        self.assertEqual(len(r.context["debit_page"]), 25)
+        self.assertEqual(r.context["credit_page"][0].name, "debt 28")
+
+        # load the next page of a section
+        url = reverse("user_credits", kwargs={"slug": "a"})
+        r = self.client.get(url, {"after": r.context["credit_cursor"]})
+        self.assertEqual(len(r.context["page"]), 5)
+        self.assertEqual(r.context["page"][-1].name, "debt 0")
+        self.assertIsNone(r.context["cursor"])
+        invalid = ("invalid", keyset.encode(["garbage", 1]), keyset.encode([None, 1]))
+        for name in ("user_credits", "user_debits"):
+            url = reverse(name, kwargs={"slug": "a" if name == "user_credits" else "b"})
+            for after in invalid:
+                r = self.client.get(url, {"after": after})
+                self.assertEqual(len(r.context["page"]), 25)
+        for after in invalid:
+            r = self.client.get(reverse("debt_list"), {"after": after})
+            self.assertEqual(r.status_code, 200)
+
+    def test_action_items(self):
+        """Resolve Action items in bulk."""
+        self.client.login(username="a", password="a")
+        debt = {
+            "name": "test",
+            "creditor": 1,
+            "value": 30,
+            "date_0": "2022-08-29",
+            "date_1": "23:33:30",
+        }
+        self.client.post(reverse("debt_create"), debt)
+        url = reverse("part_create", kwargs={"pk": 1})
+        for debitor in (1, 2, 3):
+            self.client.post(url, {"debitor": debitor, "part": 1})
+        self.client.post(reverse("part_delete", kwargs={"pk": 3}))
+
+        # one query for actions and their users, and one per model of living items
+        with self.assertNumQueries(3):
+            actions = Action.objects.all().with_items()
+            strs = [str(action) for action in actions]
+        self.assertEqual(strs[0], "a created test")
+        self.assertEqual(strs[1], "a created Part of 15.00\xa0€ from a for test: ")
+        self.assertEqual(actions[-1].item()["pk"], None)
+        page = self.client.get(reverse("debt_detail", kwargs={"pk": 1}))
+        self.assertContains(page, '<a href="/debt/1">2</a>')
+
+        # indexed target columns, kept for deleted objects
+        deleted = Action.objects.last()
+        self.assertEqual((deleted.object_id, deleted.parent_id), (3, 1))
+        self.assertEqual(len(page.context["actions"]), 5)
+        self.assertEqual(Action.objects.history(Debt.objects.get(pk=1)).count(), 1)
+
+    def test_archive_actions(self):
+        """Run the "archive_actions" management command, and read the archive."""
+        self.client.login(username="a", password="a")
+        debt = {
+            "name": "test",
+            "creditor": 1,
+            "value": 30,
+            "date_0": "2022-08-29",
+            "date_1": "23:33:30",
+        }
+        self.client.post(reverse("debt_create"), debt)
+        url = reverse("part_create", kwargs={"pk": 1})
+        for debitor in (1, 2):
+            self.client.post(url, {"debitor": debitor, "part": 1})
+        Action.objects.filter(pk__lte=2).update(created=timezone.now() - timedelta(400))
+        Debt.objects.update(created=timezone.now() - timedelta(400))
+
+        with (
+            TemporaryDirectory() as archive,
+            self.settings(ACTIONS_ARCHIVE_DIR=archive),
+        ):
+            out = StringIO()
+            call_command("archive_actions", stdout=out)
+            self.assertIn("2 action(s) archived", out.getvalue())
+            self.assertEqual(Action.objects.count(), 1)
+            self.assertEqual(len(list(Path(archive).iterdir())), 1)
+
+            # appending, even for the same month
+            Action.objects.update(created=timezone.now() - timedelta(400))
+            late = []
+
+            def to_line(action, to_line=actions_archive.to_line):
+                """Log an action while the others are archived."""
+                if not late:
+                    late.append(Action.log(action.user, "U", Debt.objects.get()))
+                    late[0].save()
+                    Action.objects.filter(pk=late[0].pk).update(created=action.created)
+                return to_line(action)
+
+            with patch("actions.archive.to_line", to_line):
+                call_command("archive_actions", "--days", "30", stdout=out)
+            self.assertEqual(list(Action.objects.all()), late)
+            Action.objects.all().delete()
+            self.assertEqual(len(list(Path(archive).iterdir())), 1)
+
+            url = reverse("debt_detail", kwargs={"pk": 1})
+            self.assertEqual(len(self.client.get(url).context["actions"]), 0)
+            page = self.client.get(url, {"archive": ""})
+            actions = page.context["actions"]
+            self.assertEqual([action.pk for action in actions], [1, 2, 3])
+            self.assertEqual(str(actions[0]), "a created test")
+            self.assertContains(page, '<a href="/debt/1">2</a>')
+
     def test_debt_views_mails(self):
         """Check debt views."""
         self.assertEqual(len(mail.outbox), 0)
@@ -336,7 +1322,7 @@ class CompotesTests(TestCase):
 
         # Call the command
         mail.outbox = []
-        call_command("reminder")
+        call_command("reminder", stdout=StringIO())
         self.assertEqual(len(mail.outbox), 4)
         self.assertIn("Hi a", mail.outbox[0].body)
         self.assertIn("is 16.67 €", mail.outbox[0].body)
@@ -353,7 +1339,7 @@ class CompotesTests(TestCase):
 
         # Call the command
         mail.outbox = []
-        call_command("reminder")
+        call_command("reminder", stdout=StringIO())
         self.assertEqual(len(mail.outbox), 3)
         self.assertIn("Hi a", mail.outbox[0].body)
         self.assertIn("is 16.67 €", mail.outbox[0].body)
@@ -362,6 +1348,61 @@ class CompotesTests(TestCase):
         self.assertIn("Hi c", mail.outbox[2].body)
         self.assertIn("is -33.33 €", mail.outbox[2].body)
 
+        # Dry run
+        mail.outbox = []
+        out = StringIO()
+        call_command("reminder", "--dry-run", stdout=out)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIn("a: 16.67 €", out.getvalue())
+        self.assertTrue(out.getvalue().endswith("3 reminder(s) to send\n"))
+        out = StringIO()
+        call_command("reminder", delay=0.01, stdout=out)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertTrue(out.getvalue().endswith("3 mail(s) sent, 0 failed\n"))
+        self.assertFalse(Mail.objects.filter(sent=None).exists())
+
+    @override_settings(EMAIL_BACKEND="compotes.tests.FlakyBackend")
+    def test_send_mails(self):
+        """Retry mails to flaky hosts later, and give them up eventually."""
+        a, b, c, _d = User.objects.all()
+        c.email = "c@flaky.example.org"
+        for user in (a, b, c):
+            user.send_mail("Hi", f"Hi {user}")
+        self.assertEqual(len(mail.outbox), 0)
+
+        out = StringIO()
+        call_command("send_mails", "--threads", "2", stdout=out)
+        self.assertEqual(out.getvalue(), "2 mail(s) sent, 1 failed\n")
+        self.assertEqual(len(mail.outbox), 2)
+        failed = Mail.objects.get(sent=None)
+        self.assertEqual(failed.to, "c@flaky.example.org")
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("SMTPServerDisconnected", failed.error)
+        self.assertGreater(failed.next_try, timezone.now())
+
+        # Nothing is pending until the backoff is over
+        out = StringIO()
+        call_command("send_mails", stdout=out)
+        self.assertEqual(out.getvalue(), "0 mail(s) sent, 0 failed\n")
+
+        Mail.objects.update(next_try=timezone.now())
+        with self.assertLogs("compotes.spool", "ERROR"):
+            call_command("send_mails", "--max-attempts", "2", stdout=StringIO())
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 2)
+        self.assertIsNone(failed.next_try)
+        self.assertEqual(len(mail.outbox), 2)
+
+        # Mails claimed by a delivery are not sent by another one
+        a.send_mail("Hi", "again")
+        self.assertEqual(len(spool.claim(timedelta(hours=1))), 1)
+        out = StringIO()
+        call_command("send_mails", stdout=out)
+        self.assertEqual(out.getvalue(), "0 mail(s) sent, 0 failed\n")
+        Mail.objects.filter(sent=None, attempts=0).update(next_try=timezone.now())
+        call_command("send_mails", stdout=out)
+        self.assertEqual(len(mail.outbox), 3)
+
     def test_pool_table(self):
         """Check Pool table has the right row colors."""
         a, b, c, d = User.objects.all()
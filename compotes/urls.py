@@ -11,12 +11,46 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("i18n/", include("django.conf.urls.i18n")),
     path("", views.UserListView.as_view(), name="home"),
+    path("users", views.UserSearchView.as_view(), name="user_search"),
+    path("settlement", views.SettlementView.as_view(), name="settlement"),
     path("user/<slug:slug>", views.UserDetailView.as_view(), name="user_detail"),
+    path(
+        "user/<slug:slug>/balances",
+        views.UserBalancesView.as_view(),
+        name="user_balances",
+    ),
+    path(
+        "user/<slug:slug>/credits",
+        views.UserCreditsView.as_view(),
+        name="user_credits",
+    ),
+    path(
+        "user/<slug:slug>/debits",
+        views.UserDebitsView.as_view(),
+        name="user_debits",
+    ),
     path("debts", views.DebtListView.as_view(), name="debt_list"),
+    path("debts/import", views.DebtsImportView.as_view(), name="debts_import"),
+    path("api/debts", views.DebtsBulkView.as_view(), name="debts_bulk"),
+    path(
+        "export/<slug:name>.<slug:fmt>",
+        views.ExportView.as_view(),
+        name="export",
+    ),
     path("debt/add", views.DebtCreateView.as_view(), name="debt_create"),
     path("debt/<int:pk>", views.DebtDetailView.as_view(), name="debt_detail"),
     path("debt/<int:pk>/update", views.DebtUpdateView.as_view(), name="debt_update"),
     path("debt/<int:pk>/part", views.PartCreateView.as_view(), name="part_create"),
+    path(
+        "debt/<int:pk>/parts",
+        views.PartsCreateView.as_view(),
+        name="parts_create",
+    ),
+    path(
+        "debt/<int:pk>/parts/edit",
+        views.PartsUpdateView.as_view(),
+        name="parts_update",
+    ),
     path("part/<int:pk>", views.PartUpdateView.as_view(), name="part_update"),
     path("part/<int:pk>/delete", views.PartDeleteView.as_view(), name="part_delete"),
     path("pools", views.PoolListView.as_view(), name="pool_list"),
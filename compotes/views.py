@@ -1,25 +1,251 @@
 """Compotes views."""
 
+import json
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from functools import reduce
+from hashlib import md5
+from io import TextIOWrapper
+from operator import or_
+
+from django import forms
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, QuerySet
-from django.http import HttpResponse
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Max, Q, QuerySet, Value
+from django.db.models.functions import Concat, Lower
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.functional import cached_property
+from django.utils.translation import get_language
 from django.utils.translation import gettext_lazy as _
-from django.views.generic import CreateView, DeleteView, DetailView, UpdateView
+from django.views.decorators.http import condition
+from django.views.generic import (
+    CreateView,
+    DeleteView,
+    DetailView,
+    FormView,
+    TemplateView,
+    UpdateView,
+    View,
+)
 from django_filters.views import FilterView
-from django_tables2 import SingleTableMixin, SingleTableView  # type: ignore
+from django_tables2 import (  # type: ignore
+    LazyPaginator,
+    SingleTableMixin,
+    SingleTableView,
+)
 from ndh.mixins import NDHDeleteMixin, NDHFormMixin
 
-from actions.models import Action
+from actions import archive
+from actions.models import Action, to_json
 from actions.views import ActionCreateMixin, ActionDeleteMixin, ActionUpdateMixin
 
+from . import export, keyset, ledger
 from .filters import DebtFilter
-from .forms import DebtForm, PartForm, ShareForm
-from .models import Debt, Part, Pool, Share, User
+from .forms import (
+    BulkDebtForm,
+    BulkPartForm,
+    DebtForm,
+    ImportForm,
+    PartForm,
+    PartFormSet,
+    PartsForm,
+    ShareForm,
+)
+from .importer import create_debts, import_debts
+from .models import BalanceHistory, Debt, Part, Pool, Share, User
+from .settlement import settle_users
 from .tables import DebtTable, PoolTable, UserTable
 
 
-class UserListView(LoginRequiredMixin, SingleTableView):
+def get_date(value: str | None) -> datetime | None:
+    """Parse a date, or a date and time, in the current time zone."""
+    try:
+        return forms.DateTimeField(required=False).clean(value)
+    except ValidationError:
+        return None
+
+
+def latest(*dates: datetime | None) -> datetime | None:
+    """Get the latest of some dates, which may be missing."""
+    return max(filter(None, dates), default=None)
+
+
+def get_version(request: HttpRequest) -> int:
+    """Get the ledger version once per request."""
+    if not hasattr(request, "ledger_version"):
+        request.ledger_version = ledger.version()
+    return request.ledger_version
+
+
+class LedgerMixin:
+    """Recompute the ledger once, after the form is saved."""
+
+    def form_valid(self, form) -> HttpResponse:
+        """Save in a ledger.deferred() block, and get the recomputed object."""
+        with ledger.deferred():
+            ret = super().form_valid(form)
+        if self.object.pk:
+            self.object.refresh_from_db()
+        return ret
+
+
+class LedgerCacheMixin:
+    """Cache the GET responses of this view, until the ledger changes.
+
+    Pages are personalized, so they are cached for each user, language and CSRF
+    cookie. Pages with pending messages are not cached.
+    """
+
+    def get_cache_key(self) -> str:
+        """Get the key of the response to this request, in this ledger version."""
+        key = repr(
+            (
+                get_version(self.request),
+                self.request.user.pk,
+                self.request.get_full_path(),
+                get_language(),
+                self.request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            ),
+        )
+        return f"ledger-page:{md5(key.encode(), usedforsecurity=False).hexdigest()}"
+
+    def dispatch(self, request, *args, **kwargs) -> HttpResponse:
+        """Get the cached response, or cache the new one once it is rendered."""
+        if request.method != "GET" or get_messages(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = self.get_cache_key()
+        if (response := cache.get(key)) is not None:
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.cookies:
+
+            def store(response):
+                cache.set(key, response, settings.LEDGER_CACHE_TIMEOUT)
+
+            if hasattr(response, "add_post_render_callback"):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+        return response
+
+
+class ConditionalMixin:
+    """Answer conditional GET requests with 304, before any heavy query.
+
+    The Last-Modified validator comes from get_last_modified(), which must be cheap.
+    The ETag also depends on the user and the language, as pages are personalized,
+    and on the ledger version, like LedgerCacheMixin, for changes of users.
+    Pages with pending messages get no validators.
+    """
+
+    def get_last_modified(self) -> datetime | None:
+        """Get when the Debts, Pools or balances were last updated, by default."""
+        return latest(
+            Debt.objects.aggregate(Max("updated"))["updated__max"],
+            Pool.objects.aggregate(Max("updated"))["updated__max"],
+            BalanceHistory.objects.aggregate(Max("date"))["date__max"],
+        )
+
+    def dispatch(self, request, *args, **kwargs) -> HttpResponse:
+        """Check validators, then dispatch, unless the client is up to date."""
+        dispatch = super().dispatch
+        if request.method != "GET" or get_messages(request):
+            return dispatch(request, *args, **kwargs)
+        if (last_modified := self.get_last_modified()) is None:
+            return dispatch(request, *args, **kwargs)
+        etag = repr(
+            (
+                get_version(request),
+                request.user.pk,
+                get_language(),
+                last_modified.isoformat(),
+            ),
+        )
+        etag = md5(etag.encode(), usedforsecurity=False).hexdigest()
+        response = condition(
+            etag_func=lambda *args, **kwargs: etag,
+            last_modified_func=lambda *args, **kwargs: last_modified,
+        )(dispatch)(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class KeysetTableMixin:
+    """Paginate a table by keyset in its default ordering, and by offset otherwise.
+
+    Keyset pages follow ?after=, a cursor on the keyset_ordering, which must give
+    the same order as the Meta.order_by of the table, and be indexed. Other orderings
+    get offset pages, which are not counted. With approximate_count, keyset pages
+    show an estimate of the number of rows.
+    """
+
+    keyset_ordering: tuple[str, ...] = ()
+    keyset_size = 25
+    table_pagination = {"paginator_class": LazyPaginator}
+    approximate_count = False
+    cursor: str | None = None
+
+    @cached_property
+    def keyset(self) -> bool:
+        """Check if this table is sorted in its default ordering."""
+        default = ",".join(self.table_class._meta.order_by)
+        return self.request.GET.get("sort", default) == default and (
+            "order_by" not in self.get_table_kwargs()
+        )
+
+    def get_table_data(self):
+        """Get the keyset page, and keep the cursor of the next one."""
+        data = super().get_table_data()
+        if not self.keyset:
+            return data
+        after = self.request.GET.get("after")
+        page, self.cursor = keyset.paginate(
+            data,
+            self.keyset_ordering,
+            after,
+            self.keyset_size,
+        )
+        return page
+
+    def get_table_pagination(self, table):
+        """Paginate by offset only outside of the keyset."""
+        return not self.keyset and super().get_table_pagination(table)
+
+    def get_context_data(self, **kwargs):
+        """Add the query strings of the first and next keyset pages, and the count."""
+        context = super().get_context_data(**kwargs)
+        if not self.keyset:
+            return context
+        params = self.request.GET.copy()
+        params.pop("page", None)
+        first = params.pop("after", None) and params.urlencode()
+        if self.cursor:
+            params["after"] = self.cursor
+        context.update(
+            keyset_first=first,
+            keyset_next=self.cursor and params.urlencode(),
+            keyset_count=self.approximate_count and keyset.estimate(self.object_list),
+        )
+        return context
+
+
+class UserListView(
+    LoginRequiredMixin, ConditionalMixin, LedgerCacheMixin, SingleTableView
+):
     """Main view."""
 
     model = User
@@ -41,22 +267,190 @@ class UserListView(LoginRequiredMixin, SingleTableView):
         }
 
 
-class UserDetailView(LoginRequiredMixin, DetailView):
-    """Debt detail view."""
+class SettlementView(
+    LoginRequiredMixin, ConditionalMixin, LedgerCacheMixin, TemplateView
+):
+    """List transfers which would settle all balances."""
+
+    template_name = "compotes/settlement.html"
+
+    def get_context_data(self, **kwargs):
+        """Add the transfers."""
+        return super().get_context_data(
+            transfers=settle_users(User.objects.all()),
+            **kwargs,
+        )
+
+
+class UserSearchView(LoginRequiredMixin, View):
+    """Suggest users whose username, first or last name start with ?q=."""
+
+    fields = ("username", "first_name", "last_name")
+    limit = 10
+    max_age = 300
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        """Get the usernames and representations of the first matching users.
+
+        Prefixes are lowercase ranges, on the lowercase indexes of those fields.
+        """
+        users = User.objects.none()
+        if query := request.GET.get("q", "").strip():
+            start = Lower(Value(query))
+            end = Concat(start, Value(chr(0x10FFFF)))
+            users = User.objects.alias(
+                **{f"{field}_lower": Lower(field) for field in self.fields},
+            ).filter(
+                reduce(
+                    or_,
+                    (
+                        Q(**{f"{field}_lower__gte": start, f"{field}_lower__lt": end})
+                        for field in self.fields
+                    ),
+                ),
+            )
+        response = JsonResponse(
+            {
+                "users": [
+                    {"value": user.username, "label": repr(user)}
+                    for user in users[: self.limit]
+                ],
+            },
+        )
+        patch_cache_control(response, private=True, max_age=self.max_age)
+        return response
+
+
+class UserSectionView(
+    LoginRequiredMixin, ConditionalMixin, LedgerCacheMixin, DetailView
+):
+    """Page of a section of the User detail view, starting after a cursor.
+
+    Subclasses set section, which gets the objects of this section from a User.
+    """
+
+    model = User
+    section: Callable[[User], QuerySet]
+    ordering: tuple[str, ...] = ()
+    paginate_by = 25
+
+    @classmethod
+    def get_page(cls, user: User, cursor: str | None = None) -> tuple[list, str | None]:
+        """Get a page of this section, and the cursor of the next one."""
+        section = cls.section(user)
+        return keyset.paginate(section, cls.ordering, cursor, cls.paginate_by)
+
+    def get_context_data(self, **kwargs):
+        """Add the page and the cursor of the next one."""
+        page, cursor = self.get_page(self.object, self.request.GET.get("after"))
+        return super().get_context_data(page=page, cursor=cursor, **kwargs)
+
+
+class UserCreditsView(UserSectionView):
+    """Debts of an User as Creditor."""
+
+    template_name = "compotes/_user_credits.html"
+    section = staticmethod(User.get_debts)
+    ordering = ("-date", "-pk")
+
+
+class UserDebitsView(UserSectionView):
+    """Parts of an User as Debitor."""
+
+    template_name = "compotes/_user_debits.html"
+    section = staticmethod(User.get_parts)
+    ordering = ("-debt__date", "-pk")
+
+
+class UserDetailView(
+    LoginRequiredMixin, ConditionalMixin, LedgerCacheMixin, DetailView
+):
+    """User detail view."""
+
+    model = User
+
+    def get_context_data(self, **kwargs):
+        """Add the first page of each section, the next ones are loaded on demand."""
+        credit_page, credit_cursor = UserCreditsView.get_page(self.object)
+        debit_page, debit_cursor = UserDebitsView.get_page(self.object)
+        history = self.object.balancehistory_set.order_by("-date", "-pk")
+        if (at := get_date(self.request.GET.get("at"))) is not None:
+            kwargs["balance_at"] = (at, self.object.balance_at(at))
+        return super().get_context_data(
+            credit_page=credit_page,
+            credit_cursor=credit_cursor,
+            debit_page=debit_page,
+            debit_cursor=debit_cursor,
+            balances=history[:10],
+            **kwargs,
+        )
+
+
+class UserBalancesView(LoginRequiredMixin, ConditionalMixin, DetailView):
+    """Get the balance history of an user between ?start= and ?end=, in JSON.
+
+    By default, this is the last year.
+    """
 
     model = User
 
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        """Get the balance at start, and each of its changes until end."""
+        end = get_date(request.GET.get("end")) or timezone.now()
+        start = get_date(request.GET.get("start")) or end - timedelta(days=365)
+        history = self.get_object().balance_history(start, end)
+        return JsonResponse(
+            {"balances": [[date.isoformat(), balance] for date, balance in history]},
+        )
+
 
-class DebtListView(LoginRequiredMixin, SingleTableMixin, FilterView):
+class DebtListView(
+    LoginRequiredMixin,
+    ConditionalMixin,
+    LedgerCacheMixin,
+    KeysetTableMixin,
+    SingleTableMixin,
+    FilterView,
+):
     """Debt list view."""
 
     model = Debt
     table_class = DebtTable
     filterset_class = DebtFilter
+    keyset_ordering = ("-date", "-pk")
+    approximate_count = True
 
-    def get_context_data(self, **kwargs):
-        """Add list of users to allow simple autocompletion in search field."""
-        return super().get_context_data(users=User.objects.all(), **kwargs)
+    def get_last_modified(self) -> datetime | None:
+        """Get when the Debts were last updated."""
+        return Debt.objects.aggregate(Max("updated"))["updated__max"]
+
+    def get_queryset(self) -> QuerySet:
+        """Annotate debitors and parts."""
+        return super().get_queryset().with_parts()
+
+    def get_table_kwargs(self):
+        """Keep the relevance order of DebtFilter when searching, unless asked."""
+        if "rank" in self.object_list.query.annotations:
+            return {"order_by": ()}
+        return {}
+
+
+class ExportView(LoginRequiredMixin, View):
+    """Stream the rows of a model, restricted by ?since=, ?until= and DebtFilter."""
+
+    def get(self, request, name: str, fmt: str) -> StreamingHttpResponse:
+        """Stream the export, as an attachment."""
+        if name not in export.EXPORTS or fmt not in export.FORMATS:
+            raise Http404
+        try:
+            queryset = export.get_queryset(export.EXPORTS[name], request.GET)
+        except ValidationError as e:
+            return HttpResponseBadRequest(e.messages)
+        return StreamingHttpResponse(
+            export.stream(export.EXPORTS[name], queryset, fmt),
+            content_type=export.FORMATS[fmt],
+            headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+        )
 
 
 class DebtCreateView(LoginRequiredMixin, NDHFormMixin, ActionCreateMixin, CreateView):
@@ -67,7 +461,9 @@ class DebtCreateView(LoginRequiredMixin, NDHFormMixin, ActionCreateMixin, Create
     title = _("Add a Debt")
 
 
-class DebtUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, UpdateView):
+class DebtUpdateView(
+    LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, LedgerMixin, UpdateView
+):
     """Debt update view."""
 
     model = Debt
@@ -75,21 +471,38 @@ class DebtUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, Update
     title = _("Edit a debt")
 
 
-class DebtDetailView(LoginRequiredMixin, DetailView):
+class DebtDetailView(
+    LoginRequiredMixin, ConditionalMixin, LedgerCacheMixin, DetailView
+):
     """Debt detail view."""
 
     model = Debt
 
+    def get_last_modified(self) -> datetime | None:
+        """Get when this Debt, its Parts, or its history were last updated."""
+        debt = Debt.objects.filter(pk=self.kwargs["pk"]).values("updated").first()
+        if debt is None:
+            return None
+        actions = Action.objects.history(Debt(pk=self.kwargs["pk"]), Part)
+        return latest(
+            debt["updated"], actions.aggregate(Max("created"))["created__max"]
+        )
+
     def get_context_data(self, **kwargs):
         """Add a Part form to create one, and related actions."""
-        actions = Action.objects.filter(
-            Q(json__model="compotes.part", json__fields__debt=self.object.pk)
-            | Q(json__model="compotes.debt", json__pk=self.object.pk),
+        actions = Action.objects.history(self.object, Part).with_items()
+        if archived := "archive" in self.request.GET:
+            actions = [*archive.history(self.object, Part), *actions]
+        return super().get_context_data(
+            actions=actions,
+            archived=archived,
+            form=PartForm(),
+            parts=self.object.part_set.select_related("debitor"),
+            **kwargs,
         )
-        return super().get_context_data(actions=actions, form=PartForm(), **kwargs)
 
 
-class PartCreateView(LoginRequiredMixin, ActionCreateMixin, CreateView):
+class PartCreateView(LoginRequiredMixin, ActionCreateMixin, LedgerMixin, CreateView):
     """Create a Part."""
 
     model = Part
@@ -101,14 +514,181 @@ class PartCreateView(LoginRequiredMixin, ActionCreateMixin, CreateView):
         return super().form_valid(form)
 
 
-class PartUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, UpdateView):
+class PartsCreateView(LoginRequiredMixin, NDHFormMixin, FormView):
+    """Create the Parts of many debitors at once."""
+
+    form_class = PartsForm
+    title = _("Add parts")
+
+    @cached_property
+    def debt(self) -> Debt:
+        """Get the Debt from the url."""
+        return get_object_or_404(Debt, pk=self.kwargs["pk"])
+
+    def get_context_data(self, **kwargs):
+        """Add the Debt."""
+        return super().get_context_data(debt=self.debt, **kwargs)
+
+    def form_valid(self, form) -> HttpResponse:
+        """Create all parts, update the debt once, and log one Action per part."""
+        parts = self.debt.add_parts(form.get_parts())
+        Action.objects.bulk_create(
+            Action.log(self.request.user, "C", part) for part in parts
+        )
+        ledger.bump()  # bulk_create sends no post_save signal
+        return super().form_valid(form)
+
+    def get_success_url(self) -> str:
+        """Return to Debt."""
+        return self.debt.get_absolute_url()
+
+
+class DebtsBulkView(LoginRequiredMixin, View):
+    """Create a batch of Debts with their Parts, from JSON.
+
+    The body is {"debts": [{"name", "date", "creditor", "description", "value",
+    "parts": [{"debitor", "part", "description"}]}]}, with usernames for users.
+    Either all debts are valid and created in one transaction, with one
+    recomputation, or none is. Each debt gets its result: its pk, url and the pks of
+    its parts, or its errors and those of its parts.
+    """
+
+    max_debts = 1000
+
+    def post(self, request, *args, **kwargs) -> JsonResponse:
+        """Validate the whole batch, then create it."""
+        try:
+            items = json.loads(request.body)["debts"]
+            if len(items) > self.max_debts:
+                return JsonResponse(
+                    {"error": f"At most {self.max_debts} debts at once"},
+                    status=400,
+                )
+            for item in items:
+                if not all(isinstance(part, dict) for part in item.get("parts", [])):
+                    raise TypeError
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return JsonResponse(
+                {"error": 'Expected {"debts": [{…, "parts": [{…}]}]}'},
+                status=400,
+            )
+        names = [item.get("creditor") for item in items]
+        names += [
+            part.get("debitor") for item in items for part in item.get("parts", [])
+        ]
+        users = User.objects.in_bulk(
+            {name for name in names if isinstance(name, str)},
+            field_name="username",
+        )
+        forms = [
+            (
+                BulkDebtForm(item, users=users),
+                [BulkPartForm(part, users=users) for part in item.get("parts", [])],
+            )
+            for item in items
+        ]
+        if not all(
+            debt.is_valid() and all(part.is_valid() for part in parts)
+            for debt, parts in forms
+        ):
+            results = [
+                {
+                    "errors": debt.errors.get_json_data(),
+                    "parts": [
+                        {"errors": part.errors.get_json_data()} for part in parts
+                    ],
+                }
+                for debt, parts in forms
+            ]
+            return JsonResponse({"results": results}, status=400)
+
+        with ledger.deferred() as dirty:
+            debts, parts = create_debts(request.user, forms)
+            dirty.debts.update(debt.pk for debt in debts)
+        results = [
+            {
+                "pk": debt.pk,
+                "url": debt.get_absolute_url(),
+                "parts": [part.pk for part in debt_parts],
+            }
+            for debt, debt_parts in zip(debts, parts, strict=True)
+        ]
+        return JsonResponse({"results": results}, status=201)
+
+
+class DebtsImportView(LoginRequiredMixin, NDHFormMixin, FormView):
+    """Import Debts from a CSV file, and report the rows which were skipped."""
+
+    form_class = ImportForm
+    template_name = "compotes/debt_import.html"
+    title = _("Import debts")
+
+    def form_valid(self, form) -> HttpResponse:
+        """Stream the file into the importer, and show its report."""
+        lines = TextIOWrapper(
+            form.cleaned_data["file"],
+            encoding="utf-8-sig",
+            newline="",
+        )
+        try:
+            report = import_debts(lines, self.request.user)
+        except ValueError as e:
+            form.add_error("file", str(e))
+            return self.form_invalid(form)
+        return self.render_to_response(
+            self.get_context_data(form=self.form_class(), report=report),
+        )
+
+
+class PartsUpdateView(LoginRequiredMixin, NDHFormMixin, UpdateView):
+    """Edit, add and delete all the Parts of a Debt at once."""
+
+    model = Debt
+    form_class = PartFormSet
+    template_name = "compotes/part_formset.html"
+    title = _("Edit parts")
+
+    def form_valid(self, form) -> HttpResponse:
+        """Save all parts with one recomputation, and log them in one Action.
+
+        This Action is an update of the Debt, with the parts created, updated
+        and deleted.
+        """
+        if not form.has_changed():
+            return HttpResponseRedirect(self.get_success_url())
+        with ledger.deferred():
+            parts = form.save(commit=False)
+            deleted = [to_json(part) for part in form.deleted_objects]
+            for part in form.deleted_objects:
+                part.delete()
+            for part in parts:
+                part.save()
+            action = Action.log(self.request.user, "U", self.object)
+            action.json["parts"] = {
+                act: objs
+                for act, objs in (
+                    ("created", [to_json(part) for part in form.new_objects]),
+                    ("updated", [to_json(part) for part, _ in form.changed_objects]),
+                    ("deleted", deleted),
+                )
+                if objs
+            }
+            action.save()
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class PartUpdateView(
+    LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, LedgerMixin, UpdateView
+):
     """Update a Part."""
 
     model = Part
     fields = ["debitor", "part", "description"]
 
 
-class PartDeleteView(LoginRequiredMixin, NDHDeleteMixin, ActionDeleteMixin, DeleteView):
+class PartDeleteView(
+    LoginRequiredMixin, NDHDeleteMixin, ActionDeleteMixin, LedgerMixin, DeleteView
+):
     """Delete a Part."""
 
     model = Part
@@ -117,15 +697,6 @@ class PartDeleteView(LoginRequiredMixin, NDHDeleteMixin, ActionDeleteMixin, Dele
         """Return to Debt."""
         return self.object.get_absolute_url()
 
-    def form_valid(self, form):
-        """Update balance."""
-        debt = self.object.debt
-        debitor = self.object.debitor
-        ret = super().form_valid(form)
-        debitor.save()
-        debt.save()
-        return ret
-
 
 class PoolCreateView(LoginRequiredMixin, NDHFormMixin, ActionCreateMixin, CreateView):
     """Pool create view."""
@@ -140,25 +711,43 @@ class PoolCreateView(LoginRequiredMixin, NDHFormMixin, ActionCreateMixin, Create
         return super().form_valid(form)
 
 
-class PoolDetailView(LoginRequiredMixin, DetailView):
+class PoolDetailView(
+    LoginRequiredMixin, ConditionalMixin, LedgerCacheMixin, DetailView
+):
     """Pool detail view."""
 
     model = Pool
 
+    def get_last_modified(self) -> datetime | None:
+        """Get when this Pool, its Shares, or its history were last updated."""
+        pool = Pool.objects.filter(slug=self.kwargs["slug"]).values("pk", "updated")
+        if (pool := pool.first()) is None:
+            return None
+        actions = Action.objects.history(Pool(pk=pool["pk"]), Share)
+        return latest(
+            pool["updated"], actions.aggregate(Max("created"))["created__max"]
+        )
+
     def get_context_data(self, **kwargs):
         """Add related actions."""
         share = Share.objects.filter(pool=self.object, participant=self.request.user)
         form = ShareForm(
             initial={"maxi": share.first().maxi} if share.exists() else None,
         )
-        actions = Action.objects.filter(
-            Q(json__model="compotes.pool", json__pk=self.object.pk)
-            | Q(json__model="compotes.share", json__fields__pool=self.object.pk),
+        actions = Action.objects.history(self.object, Share).with_items()
+        if archived := "archive" in self.request.GET:
+            actions = [*archive.history(self.object, Share), *actions]
+        return super().get_context_data(
+            actions=actions,
+            archived=archived,
+            form=form,
+            **kwargs,
         )
-        return super().get_context_data(actions=actions, form=form, **kwargs)
 
 
-class PoolUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, UpdateView):
+class PoolUpdateView(
+    LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, LedgerMixin, UpdateView
+):
     """Pool update view."""
 
     model = Pool
@@ -166,7 +755,9 @@ class PoolUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, Update
     title = _("Edit a pool")
 
 
-class ShareUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, UpdateView):
+class ShareUpdateView(
+    LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, LedgerMixin, UpdateView
+):
     """Share update view."""
 
     model = Share
@@ -179,14 +770,22 @@ class ShareUpdateView(LoginRequiredMixin, NDHFormMixin, ActionUpdateMixin, Updat
         return Share.objects.get_or_create(pool=pool, participant=self.request.user)[0]
 
 
-class PoolListView(LoginRequiredMixin, SingleTableView):
+class PoolListView(
+    LoginRequiredMixin,
+    ConditionalMixin,
+    LedgerCacheMixin,
+    KeysetTableMixin,
+    SingleTableView,
+):
     """Debt list view."""
 
     model = Pool
     table_class = PoolTable
+    keyset_ordering = ("updated", "pk")
 
     def get_queryset(self) -> QuerySet:
         """Show only those the user knows."""
+        shares = Share.objects.filter(participant=self.request.user)
         return self.model.objects.filter(
-            Q(organiser=self.request.user) | Q(share__participant=self.request.user),
-        ).distinct()
+            Q(organiser=self.request.user) | Q(pk__in=shares.values("pool")),
+        )